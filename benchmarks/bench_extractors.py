@@ -0,0 +1,211 @@
+"""
+Offline benchmark for source extraction and deobfuscation.
+
+Replays saved host pages (benchmarks/corpus/*.html and any debug_page_*.html
+dumped by the downloader) through PageView, every registered extractor and
+the decoding helpers, and reports per-page parse and extraction times, hit/miss
+and allocations. With --baseline the results are compared to a saved run and
+the exit code is 1 on a slowdown or a changed hit.
+
+    python benchmarks/bench_extractors.py
+    python benchmarks/bench_extractors.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_extractors.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rich.console import Console
+from rich.table import Table
+
+from network import extractors
+from network.extractors import (EXTRACTORS, ExtractorStats, PageView, _A168C_RE, _BASE64_RE, _DECODED_M3U8_RE,
+                                _DECODED_MP4_RE, _MKGMA_RE, _rot13, _shift_chars, clean_base64,
+                                deobfuscate_embedded_json, extract_source, is_bait_source)
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+DEFAULT_PATTERNS = [os.path.join(CORPUS_DIR, '*.html'), 'debug_page_*.html']
+
+console = Console()
+
+
+def load_corpus(paths):
+    """Map page name -> html for every file or directory in *paths*"""
+    pages = {}
+    for pattern in paths:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.html')
+        for path in sorted(glob.glob(pattern)):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def measure(func, repeat):
+    """Best wall time in µs over *repeat* calls, then one traced call for allocations; returns (us, peak_kib, result)"""
+    times = []
+    with redirect_stdout(io.StringIO()):  # extractors report hits on stdout
+        result = func()  # warm-up: regex caches, lazy imports
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            times.append((time.perf_counter() - started) * 1e6)
+
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    # The minimum is the least disturbed by other load on the machine
+    return min(times), peak / 1024, result
+
+
+def _cold_extract(page):
+    # A fresh ExtractorStats keeps the registration order, so every repeat runs the same chain
+    extractors.stats = ExtractorStats()
+    return extract_source(page)
+
+
+def bench_pages(pages, repeat):
+    """Results keyed 'page/step': parse, each extractor, and the full extract_source chain"""
+    results = {}
+    for name, html in pages.items():
+        url = f'https://corpus.invalid/{name}'
+        us, kib, page = measure(lambda: PageView(url, html), repeat)
+        results[f'{name}/parse'] = {'us': us, 'kib': kib}
+
+        for ex in EXTRACTORS:
+            def run(func=ex.func):
+                try:
+                    return func(page)
+                except Exception:
+                    return None
+            us, kib, hit = measure(run, repeat)
+            results[f'{name}/{ex.name}'] = {'us': us, 'kib': kib, 'hit': bool(hit)}
+
+        saved = extractors.stats
+        try:
+            us, kib, source = measure(lambda: _cold_extract(page), repeat)
+        finally:
+            extractors.stats = saved
+        results[f'{name}/extract_source'] = {'us': us, 'kib': kib, 'hit': bool(source)}
+    return results
+
+
+def helper_inputs(pages):
+    """Inputs for the decoding helpers, harvested from the corpus"""
+    inputs = {'deobfuscate_embedded_json': [], '_rot13': [], '_shift_chars': [], 'clean_base64': [],
+              'is_bait_source': []}
+    for name, html in pages.items():
+        page = PageView(f'https://corpus.invalid/{name}', html)
+        inputs['deobfuscate_embedded_json'] += page.json_scripts
+        for match in _MKGMA_RE.finditer(html):
+            inputs['_rot13'].append(match.group(1))
+            inputs['_shift_chars'].append(match.group(1))
+        for regex in (_A168C_RE, _BASE64_RE):
+            inputs['clean_base64'] += [match.group(1) for match in regex.finditer(html)]
+        for regex in (_DECODED_MP4_RE, _DECODED_M3U8_RE):
+            inputs['is_bait_source'] += [match.group(1) for match in regex.finditer(html)]
+    return inputs
+
+
+def bench_helpers(pages, repeat):
+    funcs = {
+        'deobfuscate_embedded_json': deobfuscate_embedded_json,
+        '_rot13': _rot13,
+        '_shift_chars': lambda text: _shift_chars(text, 3),
+        'clean_base64': clean_base64,
+        'is_bait_source': is_bait_source,
+    }
+    results = {}
+    for name, values in helper_inputs(pages).items():
+        if not values:
+            continue
+        us, kib, _ = measure(lambda: [funcs[name](value) for value in values], repeat)
+        results[f'helpers/{name}'] = {'us': us, 'kib': kib, 'calls': len(values)}
+    return results
+
+
+def compare(results, baseline, tolerance, floor_us):
+    """Regressions against *baseline*: slower beyond tolerance, or a hit that turned into a miss (or back)"""
+    regressions = []
+    for key, now in results.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        if 'hit' in now and now['hit'] != before.get('hit'):
+            regressions.append((key, f"hit changed: {before.get('hit')} -> {now['hit']}"))
+        if now['us'] > before['us'] * (1 + tolerance) and now['us'] - before['us'] > floor_us:
+            regressions.append((key, f"{before['us']:.1f} -> {now['us']:.1f} µs"))
+    return regressions
+
+
+def print_report(results, baseline):
+    table = Table(title="Extraction benchmark")
+    table.add_column("Page / step", style="cyan")
+    table.add_column("Best µs", justify="right")
+    table.add_column("Peak KiB", justify="right")
+    table.add_column("Hit", justify="center")
+    table.add_column("vs baseline", justify="right")
+    for key, now in results.items():
+        hit = '' if 'hit' not in now else ('[green]hit' if now['hit'] else '[dim]miss')
+        delta = ''
+        before = baseline.get(key)
+        if before and before['us']:
+            change = (now['us'] / before['us'] - 1) * 100
+            delta = f"[{'red' if change > 0 else 'green'}]{change:+.0f}%"
+        table.add_row(key, f"{now['us']:.1f}", f"{now['kib']:.1f}", hit, delta)
+    console.print(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for source extraction")
+    parser.add_argument('paths', nargs='*', help="HTML files, globs or directories (default: corpus + debug pages)")
+    parser.add_argument('-n', '--repeat', type=int, default=20, help="timed runs per measurement")
+    parser.add_argument('--baseline', help="compare against this baseline JSON")
+    parser.add_argument('--save-baseline', metavar='FILE', help="write the results as a new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument('--floor-us', type=float, default=10.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    pages = load_corpus(args.paths or DEFAULT_PATTERNS)
+    if not pages:
+        console.print("[red][!] No pages found[/red]")
+        return 2
+    console.print(f"[*] {len(pages)} pages, {len(EXTRACTORS)} extractors, {args.repeat} runs each")
+
+    results = bench_pages(pages, args.repeat)
+    results.update(bench_helpers(pages, args.repeat))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}, f, indent=2)
+        console.print(f"[green]Baseline saved to {args.save_baseline}[/green]")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance, args.floor_us)
+        for key, reason in regressions:
+            console.print(f"[red][!] Regression in {key}: {reason}[/red]")
+        if regressions:
+            return 1
+        console.print("[green]No regressions against the baseline[/green]")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
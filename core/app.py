@@ -5,6 +5,7 @@ from config import Config
 from settings import SettingsManager
 from core.search import SeriesSearcher
 from core.download_manager import DownloadManager
+from network import http_client, membudget, politeness, progress, ratelimit, resolve_cache, writer, ytdlp_backend
 from utils import clear_console
 
 class SeriesDLApp:
@@ -13,6 +14,13 @@ class SeriesDLApp:
         self.settings = SettingsManager(console=self.console)
         self.searcher = SeriesSearcher(console=self.console, settings_manager=self.settings)
         self.downloader = DownloadManager(console=self.console, settings_manager=self.settings)
+        resolve_cache.configure(self.settings.settings)
+        ratelimit.configure(self.settings.settings)
+        politeness.configure(self.settings.settings)
+        progress.configure(self.settings.settings)
+        writer.configure(self.settings.settings)
+        membudget.configure(self.settings.settings)
+        ytdlp_backend.configure(self.settings.settings)
         self.session_stats = {'searches': 0, 'downloads': 0, 'errors': 0}
 
     def run(self):
@@ -22,6 +30,14 @@ class SeriesDLApp:
 
             if self._should_show_settings():
                 self.settings.show_settings_menu()
+                http_client.configure(self.settings.settings)
+                resolve_cache.configure(self.settings.settings)
+                ratelimit.configure(self.settings.settings)
+                politeness.configure(self.settings.settings)
+                progress.configure(self.settings.settings)
+                writer.configure(self.settings.settings)
+                membudget.configure(self.settings.settings)
+                ytdlp_backend.configure(self.settings.settings)
                 self.console.print("\n[green]Settings configured! Starting SeriesDL...[/green]\n")
                 clear_console()
             
@@ -81,6 +97,9 @@ class SeriesDLApp:
         stats_text += f"• Downloads: {self.session_stats['downloads']}\n"
         if self.session_stats['errors'] > 0:
             stats_text += f"• Errors: {self.session_stats['errors']}\n"
+        memory = membudget.budget.stats()
+        if memory['peak']:
+            stats_text += f"• Buffer memory: {self._format_memory(memory)}\n"
         
         goodbye_panel = Panel(
             f"[bold yellow]Thanks for using SeriesDL![/bold yellow]\n\n{stats_text}\n"
@@ -93,8 +112,21 @@ class SeriesDLApp:
     def _update_stats_display(self):
         """Update session statistics display"""
         if self.session_stats['searches'] > 0:
-            stats = f"[dim]Session: {self.session_stats['searches']} searches, {self.session_stats['downloads']} downloads[/dim]"
-            self.console.print(stats)
+            stats = f"Session: {self.session_stats['searches']} searches, {self.session_stats['downloads']} downloads"
+            memory = membudget.budget.stats()
+            if memory['peak']:
+                stats += f", buffers {self._format_memory(memory)}"
+            self.console.print(f"[dim]{stats}[/dim]")
+
+    @staticmethod
+    def _format_memory(memory: dict) -> str:
+        """Current/peak buffer usage against the budget, in MB"""
+        text = f"{memory['current'] / 1024 / 1024:.0f} MB now, {memory['peak'] / 1024 / 1024:.0f} MB peak"
+        if memory['limit']:
+            text += f" of {memory['limit'] / 1024 / 1024:.0f} MB"
+        if memory['waits']:
+            text += f", {memory['waits']} waits ({memory['wait_time']:.1f}s)"
+        return text
     
     def _process_series_search(self, query: str) -> bool:
         """Process a series search and download"""
@@ -131,7 +163,10 @@ class SeriesDLApp:
                 self.console.print("[red]No valid host selected.[/red]")
                 return False
             
-            self.downloader.download_series_episodes(details, selected_content, lang, host_info)
+            self.downloader.download_series_episodes(
+                details, selected_content, lang, host_info,
+                resolve_host=lambda item: self.searcher.resolve_item_host(item, lang, host_info)
+            )
             return True
             
         except Exception as e:
@@ -1,80 +1,291 @@
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 from utils import sanitize_filename
 from models.episode import Episode
-from network.downloader import download
+from network import downloader, async_engine, progress, verify
 from models.movie import Movie
-from rich.prompt import Confirm
+from rich.prompt import Confirm, Prompt
+from core.job_queue import get_job_queue
+from core.preflight import Preflight
+from core.library import COMPLETE, MISSING, PARTIAL, POLICIES, UNVERIFIED, LibraryIndex, item_key
+from network.resume import DownloadState
+
+
+class HostPrefetcher:
+    """
+    Resolves the host link and media source of upcoming items in the background.
+    Asking for item N schedules items N+1..N+lookahead, so their resolution runs
+    while item N downloads instead of in front of each transfer.
+    """
+
+    def __init__(self, resolve, count: int, lookahead: int = 2):
+        self.resolve = resolve
+        self.count = count
+        self.lookahead = max(0, lookahead)
+        self._executor = ThreadPoolExecutor(max_workers=self.lookahead + 1, thread_name_prefix='prefetch')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, index: int):
+        with self._lock:
+            for upcoming in range(index, min(index + self.lookahead + 1, self.count)):
+                if upcoming not in self._futures:
+                    self._futures[upcoming] = self._executor.submit(self.resolve, upcoming)
+            future = self._futures[index]
+        return future.result()
+
+    def close(self):
+        # shutdown(cancel_futures=True) needs Python 3.9; cancel the queued resolves by hand
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+        self._executor.shutdown(wait=False)
+
 
 class DownloadManager:
+    # Targets being written by any running batch, so concurrent jobs never share an output file
+    _active_targets = set()
+    _active_lock = threading.Lock()
+
     def __init__(self, console, settings_manager):
         self.console = console
         self.settings_manager = settings_manager
 
-    def download_series_episodes(self, details: dict, content_items: list, lang: str, host_info: dict):
-        """Handle downloading of series episodes/movies"""
-        download_dir = self.settings_manager.settings.get("download_folder", "downloads")
+    def download_series_episodes(self, details: dict, content_items: list, lang: str, host_info: dict,
+                                 resolve_host=None):
+        """
+        Handle downloading of series episodes/movies. *host_info* is the host chosen
+        for the first item; *resolve_host(item)* finds the matching host for the others.
+        """
+        download_dir = os.path.abspath(self.settings_manager.settings.get("download_folder", "downloads"))
         os.makedirs(download_dir, exist_ok=True)
 
-        original_dir = os.getcwd()
-        os.chdir(download_dir)
-
         successful_downloads = 0
         failed_downloads = 0
 
+        engine = self.settings_manager.settings.get("download_engine", "threads")
+        download = async_engine.download if engine == "asyncio" else downloader.download
+
+        # Every item is a job in the persistent queue; finished ones count as downloaded on a later run
+        jobs = get_job_queue()
+        batch = f"series:{details['title']}:{lang}"
+        filenames = [self._filename(details, item, lang) for item in content_items]
+        # Every path is decided here and handed down to the downloaders; nothing depends on the cwd
+        targets = [os.path.join(download_dir, filename) for filename in filenames]
+        jobs.enqueue(batch, ((filename, item.url, target)
+                             for filename, target, item in zip(filenames, targets, content_items)))
+        jobs.requeue(batch, self.settings_manager.settings.get("retry_attempts", 3))
+        library = LibraryIndex(download_dir)
+
+        prefetcher = None
+        claimed = []
+        on_disk = 0
         try:
-            self.console.print(f"[bold]Starting download of {len(content_items)} items...[/bold]")
-        
-            for i, item in enumerate(content_items, 1):
-                # Generate filename based on item type
-                if isinstance(item, Movie):
-                    eng_title = getattr(item, 'english_title', '') or item.title
-                    eng_title = eng_title.replace(' ', '_')
-                    filename = f"{details['title'].replace(' ', '_')}_Movie_{item.movie}_{eng_title}_{lang}.mp4"
-                else:
-                    filename = f"{details['title'].replace(' ', '_')}_{item.title}_{lang}.mp4"
-            
-                filename = sanitize_filename(filename)
-                self.console.print(f"[blue]({i}/{len(content_items)}) Downloading: {filename}[/blue]")
-            
-                # Check if file exists
-                if os.path.exists(filename):
+            # Prompts happen up front, so the downloads below can run unattended and in parallel
+            keys = [item_key(details['title'], item, lang) for item in content_items]
+            statuses = [library.status(key, filename) for key, filename in zip(keys, filenames)]
+            item_jobs = [jobs.get(batch, filename) for filename in filenames]
+            # A job that finished on an earlier run was verified then; its file needs no second check
+            statuses = [(COMPLETE, filename) if status == UNVERIFIED and job.state == 'done' else (status, filename)
+                        for (status, filename), job in zip(statuses, item_jobs)]
+            policy = self._existing_files_policy(statuses)
+
+            planned = []
+            for key, (status, filename), job, item in zip(keys, statuses, item_jobs, content_items):
+                target = os.path.join(download_dir, filename)
+
+                if status == UNVERIFIED and policy in ('skip', 'resume'):
+                    # Checked once; the verify manifest remembers it for later runs
+                    status = COMPLETE if verify.check(target).ok else MISSING
+                if status == COMPLETE:
+                    if policy == 'each':
+                        skip = not Confirm.ask(f"[yellow]File '{filename}' exists. Overwrite?[/yellow]", default=False)
+                    else:
+                        skip = policy != 'overwrite'
+                    if skip:
+                        self.console.print(f"[green]Already downloaded: {filename}[/green]")
+                        continue
+                elif status == UNVERIFIED and policy == 'each':
                     if not Confirm.ask(f"[yellow]File '{filename}' exists. Overwrite?[/yellow]", default=False):
                         self.console.print(f"[yellow]Skipped: {filename}[/yellow]")
                         continue
+                elif status == PARTIAL and policy == 'skip':
+                    self.console.print(f"[yellow]Skipped: {filename} (partially downloaded)[/yellow]")
+                    continue
+                elif status == PARTIAL and policy == 'overwrite':
+                    self._discard_partial(target)
+
+                with self._active_lock:
+                    if target in self._active_targets:
+                        self.console.print(f"[yellow]Skipped: {filename} is already being downloaded[/yellow]")
+                        continue
+                    self._active_targets.add(target)
+                claimed.append(target)
+                planned.append((filename, target, job, item, key))
+
+            if not planned:
+                self.console.print("[green]Nothing to download, every selected item is already there.[/green]")
+                return
+
+            def host_for(item):
+                return host_info if item is content_items[0] or resolve_host is None else resolve_host(item)
+
+            # Hosts found by the pre-flight, by target; it already warmed the resolution and probe caches
+            hosts = {}
+            preflight_workers = int(self.settings_manager.settings.get("preflight_workers", 8))
+            if preflight_workers > 0:
+                preflight = Preflight(self.console, preflight_workers)
+                probed = preflight.run([(item, target) for _, target, _, item, _ in planned], host_for)
+                if not preflight.report(probed, download_dir, jobs.throughput()):
+                    self.console.print("[yellow]Download cancelled.[/yellow]")
+                    return
+                hosts = {result.target: result.host for result in probed if result.source}
+                on_disk = sum(result.on_disk for result in probed)
+                # Largest first, so a big file doesn't start last and run alone; unknown sizes keep their place at the end
+                sizes = {result.target: result.size for result in probed}
+                planned.sort(key=lambda entry: -sizes[entry[1]])
+
+            def resolve(index):
+                target, item = planned[index][1], planned[index][3]
+                if target in hosts:
+                    return hosts[target]
+                host = host_for(item)
+                if host:
+                    # Warms the resolution cache, so the download itself starts with the media URL
+                    downloader.resolve_cached(host['url'])
+                return host
 
-                # Download the content
-                try:
-                    if download(host_info['url']):
-                        if os.path.exists(filename) and os.path.getsize(filename) > 0:
-                            self.console.print(f"[green]✓ Successfully downloaded: {filename}[/green]")
-                            successful_downloads += 1
-                        else:
-                            self.console.print(f"[red]✗ Failed to download: {filename}[/red]")
-                            failed_downloads += 1
+            prefetcher = HostPrefetcher(resolve, len(planned),
+                                        int(self.settings_manager.settings.get("resolve_lookahead", 2)))
+
+            workers = max(1, min(int(self.settings_manager.settings.get("max_concurrent_downloads", 3)), len(planned) or 1))
+            self.console.print(f"[bold]Starting download of {len(planned)} items, {workers} at a time...[/bold]")
+
+            results = {}
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._download_item, download, prefetcher, index, target, job, jobs,
+                                    library, key): filename
+                    for index, (filename, target, job, _, key) in enumerate(planned)
+                }
+                for i, future in enumerate(as_completed(futures), 1):
+                    filename = futures[future]
+                    try:
+                        results[filename] = future.result()
+                    except Exception as e:
+                        results[filename] = (False, str(e))
+                    ok, reason = results[filename]
+                    if ok:
+                        self.console.print(f"[green]✓ ({i}/{len(planned)}) Successfully downloaded: {filename}[/green]")
+                        successful_downloads += 1
                     else:
-                        self.console.print(f"[red]✗ Failed to download: {filename}[/red]")
+                        detail = f" ({reason})" if reason else ""
+                        self.console.print(f"[red]✗ ({i}/{len(planned)}) Failed to download: {filename}{detail}[/red]")
                         failed_downloads += 1
-                except Exception as e:
-                    self.console.print(f"[red]✗ Failed to download {filename}: {e}[/red]")
-                    failed_downloads += 1
 
-                # Delay between downloads
-                delay = self.settings_manager.settings.get("delay_between_downloads", 0.5)
-                if i < len(content_items) and delay > 0:
-                    time.sleep(delay)
+            # Measured over the whole batch, concurrency included, for the next pre-flight's ETA
+            moved = sum(os.path.getsize(target) for filename, target, _, _, _ in planned
+                        if results.get(filename, (False,))[0] and os.path.exists(target)) - on_disk
+            if moved > 0:
+                jobs.record_throughput(moved, time.monotonic() - started)
 
             # Show summary
             self.console.print(f"\n[bold green]Download Summary:[/bold green]")
             self.console.print(f"[green]✓ Successful: {successful_downloads}[/green]")
             if failed_downloads > 0:
                 self.console.print(f"[red]✗ Failed: {failed_downloads}[/red]")
+                for filename, (ok, reason) in results.items():
+                    if not ok:
+                        self.console.print(f"[red]  • {filename}{': ' + reason if reason else ''}[/red]")
         
             if successful_downloads > 0:
-                self.console.print(f"[green]Files saved to: {os.path.abspath(download_dir)}[/green]")
+                self.console.print(f"[green]Files saved to: {download_dir}[/green]")
 
         except Exception as e:
             self.console.print(f"[red]Download error: {e}[/red]")
         finally:
-            os.chdir(original_dir)
\ No newline at end of file
+            if prefetcher:
+                prefetcher.close()
+            library.save()
+            with self._active_lock:
+                self._active_targets.difference_update(claimed)
+            downloader.clear_probe_cache()
+            progress.hub.flush()
+
+    def _download_item(self, download, prefetcher: HostPrefetcher, index: int, target: str, job, jobs,
+                       library: LibraryIndex, key: str):
+        """Download and verify one item on a worker thread; returns (ok, reason)"""
+        host_info = prefetcher.get(index)
+        if not host_info:
+            jobs.update(job.id, 'failed', error='no host for this item')
+            return False, 'no host for this item'
+        self.console.print(f"[blue]Downloading: {os.path.basename(target)} ({host_info['name']})[/blue]")
+        if not self._download_with_failover(download, host_info, target, jobs.reporter(job.id),
+                                            jobs.reporter(job.id, count_attempts=False)):
+            return False, ''
+        # Files verified during the transfer are confirmed from the manifest
+        verified = verify.check(target)
+        if not verified.ok:
+            jobs.update(job.id, 'failed', error=verified.reason)
+            return False, verified.reason
+        library.record(key, target, verified)
+        return True, ''
+
+    def _existing_files_policy(self, statuses) -> str:
+        """
+        The existing_files setting, with 'ask' turned into one question for the
+        whole selection: skip, overwrite, resume, or ask per file ('each').
+        """
+        policy = self.settings_manager.settings.get("existing_files", "ask")
+        if policy not in POLICIES:
+            policy = "ask"
+        counts = {status: 0 for status in (COMPLETE, UNVERIFIED, PARTIAL, MISSING)}
+        for status, _ in statuses:
+            counts[status] += 1
+        existing = counts[COMPLETE] + counts[UNVERIFIED]
+        if existing or counts[PARTIAL]:
+            self.console.print(f"[cyan]Library: {counts[COMPLETE]} verified, {counts[UNVERIFIED]} unverified, "
+                               f"{counts[PARTIAL]} partial, {counts[MISSING]} new[/cyan]")
+        if policy != "ask" or not (existing or counts[PARTIAL]):
+            return policy
+        return Prompt.ask(
+            f"[yellow]{existing + counts[PARTIAL]} of {len(statuses)} selected items are already on disk. "
+            f"Skip them, overwrite them, resume the partial ones, or ask for each?[/yellow]",
+            choices=["skip", "overwrite", "resume", "each"], default="resume"
+        )
+
+    @staticmethod
+    def _discard_partial(target: str):
+        """Remove an interrupted download so it starts from scratch"""
+        for path in (target + '.part', target + '.part' + DownloadState.SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _filename(details: dict, item, lang: str) -> str:
+        """Output filename for one episode or movie"""
+        if isinstance(item, Movie):
+            eng_title = getattr(item, 'english_title', '') or item.title
+            eng_title = eng_title.replace(' ', '_')
+            filename = f"{details['title'].replace(' ', '_')}_Movie_{item.movie}_{eng_title}_{lang}.mp4"
+        else:
+            filename = f"{details['title'].replace(' ', '_')}_{item.title}_{lang}.mp4"
+        return sanitize_filename(filename)
+
+    def _download_with_failover(self, download, host_info: dict, target: str, report=None,
+                                failover_report=None) -> bool:
+        """
+        Try the chosen host, then any raced alternatives in their ranked order.
+        Failover hosts report through *failover_report*, so they don't count as new attempts.
+        """
+        candidates = [host_info] + host_info.get('failover', [])
+        for n, host in enumerate(candidates):
+            if n:
+                self.console.print(f"[yellow]Retrying with host {host['name']}...[/yellow]")
+            if download(host['url'], (failover_report or report) if n else report, target):
+                return True
+        return False
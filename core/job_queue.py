@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Next to where SeriesDL was started
+QUEUE_FILE = os.path.abspath('seriesdl_jobs.db')
+
+STATES = ('pending', 'resolving', 'downloading', 'done', 'failed')
+# States a crash or Ctrl-C can leave behind; those jobs were interrupted, not finished
+ACTIVE_STATES = ('resolving', 'downloading')
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    batch TEXT NOT NULL,
+    key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    target TEXT NOT NULL DEFAULT '',
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    error TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (batch, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_batch_state ON jobs (batch, state, id);
+CREATE TABLE IF NOT EXISTS transfers (
+    id INTEGER PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    batch: str
+    key: str
+    url: str
+    target: str = ''
+    state: str = 'pending'
+    attempts: int = 0
+    bytes: int = 0
+    error: str = ''
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+
+class JobQueue:
+    """
+    Durable download queue in SQLite. Jobs are grouped into batches (a URL list,
+    a series) and keyed within them, so enqueueing the same list again only adds
+    new lines, and a restart resumes the jobs that never finished.
+    """
+
+    def __init__(self, path: str = QUEUE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        # WAL keeps every committed state change across a crash without an fsync per write
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def enqueue(self, batch: str, items: Iterable[Tuple[str, str, str]]) -> int:
+        """Add (key, url, target) jobs to *batch*; keys already queued are left alone. Returns the number added"""
+        now = time.time()
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute('BEGIN')
+            self._db.executemany(
+                'INSERT OR IGNORE INTO jobs (batch, key, url, target, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                ((batch, key, url, target, now, now) for key, url, target in items)
+            )
+            self._db.execute('COMMIT')
+            return self._db.total_changes - before
+
+    def requeue(self, batch: str, max_attempts: int = MAX_ATTEMPTS) -> int:
+        """Send interrupted jobs, and failed ones with attempts left, back to pending"""
+        with self._lock:
+            cursor = self._db.execute(
+                f"UPDATE jobs SET state = 'pending', updated_at = ? WHERE batch = ? AND "
+                f"(state IN ({', '.join('?' * len(ACTIVE_STATES))}) OR (state = 'failed' AND attempts < ?))",
+                (time.time(), batch, *ACTIVE_STATES, max_attempts)
+            )
+            return cursor.rowcount
+
+    def pending(self, batch: str) -> List[Job]:
+        """Jobs of *batch* still to run, in the order they were queued"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE batch = ? AND state = 'pending' ORDER BY id", (batch,)
+            ).fetchall()
+        return [Job(**dict(row)) for row in rows]
+
+    def get(self, batch: str, key: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE batch = ? AND key = ?', (batch, key)).fetchone()
+        return Job(**dict(row)) if row else None
+
+    def update(self, job_id: int, state: str, count_attempt: bool = True, **fields):
+        """
+        Move a job to *state*, optionally setting target, bytes or error. Entering
+        'resolving' counts an attempt unless *count_attempt* is False.
+        """
+        if state not in STATES:
+            raise ValueError(f"Unknown job state: {state}")
+        columns = {name: value for name, value in fields.items() if name in ('target', 'bytes', 'error')}
+        assignments = ''.join(f', {name} = ?' for name in columns)
+        if state == 'resolving' and count_attempt:
+            assignments += ', attempts = attempts + 1'
+        with self._lock:
+            self._db.execute(
+                f'UPDATE jobs SET state = ?, updated_at = ?{assignments} WHERE id = ?',
+                (state, time.time(), *columns.values(), job_id)
+            )
+
+    def reporter(self, job_id: int, count_attempts: bool = True) -> Callable:
+        """
+        Callback for downloader.download(report=...) that records each step of one job.
+        With *count_attempts* False, e.g. for failover hosts, resolving again is not a new attempt.
+        """
+        return lambda state, **fields: self.update(job_id, state, count_attempts, **fields)
+
+    def counts(self, batch: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT state, COUNT(*) FROM jobs WHERE batch = ? GROUP BY state', (batch,)
+            ).fetchall()
+        return {state: count for state, count in rows}
+
+    def record_throughput(self, nbytes: int, seconds: float):
+        """Remember how many bytes a download run moved and how long its transfers took"""
+        with self._lock:
+            self._db.execute('INSERT INTO transfers (bytes, seconds, finished_at) VALUES (?, ?, ?)',
+                             (nbytes, seconds, time.time()))
+
+    def throughput(self, runs: int = 5) -> float:
+        """Bytes per second over the last *runs* download runs; 0 when nothing was measured yet"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT SUM(bytes), SUM(seconds) FROM (SELECT bytes, seconds FROM transfers ORDER BY id DESC LIMIT ?)',
+                (runs,)
+            ).fetchone()
+        nbytes, seconds = row
+        return nbytes / seconds if seconds else 0.0
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
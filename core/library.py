@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from models.movie import Movie
+from network.resume import DownloadState
+from network.verify import VerifyResult, load_manifest
+
+LIBRARY_NAME = '.seriesdl-library.json'
+POLICIES = ('ask', 'skip', 'overwrite', 'resume')
+
+# What the index knows about one selected item
+MISSING = 'missing'          # nothing on disk
+PARTIAL = 'partial'          # an interrupted .part that can be resumed
+UNVERIFIED = 'unverified'    # a file is there, but it was never verified
+COMPLETE = 'complete'        # verified, and unchanged since
+
+
+def item_key(series: str, item, lang: str) -> str:
+    """Library key of an episode or movie: (series, season, episode or movie, language)"""
+    if isinstance(item, Movie):
+        return f"{series}|movie {item.movie}|{lang}"
+    return f"{series}|S{item.season:02d}E{item.episode:02d}|{lang}"
+
+
+class LibraryIndex:
+    """
+    What a download folder already holds. Built once per run from a single
+    directory scan, the verify manifest and the library file, so a selection of
+    any size is diffed against it without touching each file.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = os.path.abspath(folder)
+        self.path = os.path.join(self.folder, LIBRARY_NAME)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._files: Dict[str, os.stat_result] = {}
+        self._manifest = load_manifest(self.folder)
+        self._dirty = False
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        if os.path.isdir(self.folder):
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if entry.is_file():
+                        self._files[entry.name] = entry.stat()
+
+    def filename(self, key: str, default: str) -> str:
+        """Where *key* lives: the recorded file if the library knows it, else *default*"""
+        recorded = self._entries.get(key, {}).get('filename')
+        return recorded if recorded and recorded in self._files else default
+
+    def status(self, key: str, default_filename: str) -> Tuple[str, str]:
+        """Returns (status, filename) for one item"""
+        filename = self.filename(key, default_filename)
+        stat = self._files.get(filename)
+        if stat is None:
+            part = filename + '.part'
+            if part in self._files and part + DownloadState.SUFFIX in self._files:
+                return PARTIAL, filename
+            return MISSING, filename
+
+        verified = self._manifest.get(filename)
+        if (verified and verified.get('ok') and verified.get('size') == stat.st_size
+                and verified.get('mtime') == stat.st_mtime):
+            return COMPLETE, filename
+        return UNVERIFIED, filename
+
+    def record(self, key: str, path: str, result: VerifyResult):
+        """Remember a finished download under its key"""
+        with self._lock:
+            self._entries[key] = {
+                'filename': os.path.basename(path),
+                'size': result.size,
+                'verified': result.ok,
+                'digest': result.digest,
+                'recorded_at': time.time(),
+            }
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
@@ -0,0 +1,113 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.prompt import Confirm
+
+from network import downloader
+from network.probe import probe_url
+from network.resume import DownloadState
+from utils import format_file_size
+
+
+@dataclass
+class ProbedItem:
+    """What the pre-flight learned about one selected item"""
+    target: str
+    host: Optional[Dict] = None
+    source: Optional[Dict] = None
+    size: int = 0      # 0 = unknown: HLS playlists, or no Content-Length
+    on_disk: int = 0   # bytes an interrupted .part already holds
+    error: str = ''
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.size - self.on_disk)
+
+
+class Preflight:
+    """
+    Resolves and probes every selected item before the first transfer starts, a
+    bounded number at a time. The results give the total size, a free-space check
+    and an ETA, and they stay in the resolution and probe caches, so the
+    downloads that follow start from the media URL and skip the HEAD request.
+    """
+
+    def __init__(self, console, workers: int = 8):
+        self.console = console
+        self.workers = max(1, workers)
+
+    def run(self, items: List, host_for: Callable) -> List[ProbedItem]:
+        """Probe (item, target) pairs with *host_for(item)* picking each item's host; results keep the input order"""
+        with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), transient=True) as progress:
+            progress.add_task(f"Pre-flight: resolving and probing {len(items)} items...", total=None)
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(items) or 1),
+                                    thread_name_prefix='preflight') as executor:
+                return list(executor.map(lambda pair: self._probe(*pair, host_for), items))
+
+    @staticmethod
+    def _probe(item, target: str, host_for: Callable) -> ProbedItem:
+        result = ProbedItem(target)
+        try:
+            result.host = host_for(item)
+            if not result.host:
+                result.error = 'no host for this item'
+                return result
+            # resolve_cached stores the source for the download, probe_url the headers for download_fast
+            result.source = downloader.resolve_cached(result.host['url'])
+            if not result.source:
+                result.error = 'no media source found'
+                return result
+            if '.m3u8' not in result.source['url']:
+                probe = probe_url(downloader.session, result.source['url'],
+                                  downloader.get_browser_headers(result.source['referer']))
+                result.size = probe.size if probe.ok else 0
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+
+        state = DownloadState.load(target + '.part')
+        if state and result.size and state.total_size == result.size:
+            result.on_disk = state.completed_bytes()
+        return result
+
+    def report(self, results: List[ProbedItem], download_dir: str, throughput: float) -> bool:
+        """Print total size, free space and ETA; False if the user stops a download that won't fit"""
+        known = [result for result in results if result.size]
+        unknown = [result for result in results if not result.size and not result.error]
+        failed = [result for result in results if result.error]
+        total = sum(result.size for result in known)
+        remaining = sum(result.remaining for result in known)
+        free = shutil.disk_usage(download_dir).free
+
+        summary = f"[cyan]Pre-flight: {len(results)} items, {format_file_size(total)}"
+        if remaining != total:
+            summary += f" ({format_file_size(remaining)} left to download)"
+        if unknown:
+            summary += f", {len(unknown)} of unknown size"
+        summary += f", {format_file_size(free)} free"
+        if throughput and remaining:
+            summary += f", ETA {self._format_eta(remaining / throughput)} at {format_file_size(int(throughput))}/s"
+        self.console.print(summary + "[/cyan]")
+
+        for result in failed:
+            self.console.print(f"[yellow]  • {os.path.basename(result.target)}: {result.error}; "
+                               f"retried when its turn comes[/yellow]")
+
+        if remaining > free:
+            self.console.print(f"[red]Not enough disk space in {download_dir}: {format_file_size(remaining)} needed, "
+                               f"{format_file_size(free)} free[/red]")
+            return Confirm.ask("[yellow]Download anyway?[/yellow]", default=False)
+        return True
+
+    @staticmethod
+    def _format_eta(seconds: float) -> str:
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return f"{hours}h {minutes:02d}m"
+        if minutes:
+            return f"{minutes}m {seconds:02d}s"
+        return f"{seconds}s"
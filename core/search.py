@@ -12,6 +12,8 @@ from config import Config
 from models.episode import Episode
 from models.movie import Movie
 from network.scraper import SeriesScraper
+from network import http_client
+from network.host_race import race_hosts
 import threading
 from collections import defaultdict
 
@@ -19,9 +21,7 @@ class SeriesSearcher:
     def __init__(self, console: Console, settings_manager):
         self.console = console
         self.settings_manager = settings_manager
-        import cloudscraper
-        self.session = cloudscraper.create_scraper()
-        self.session.headers.update(Config.DEFAULT_HEADERS)
+        self.session = http_client.configure(settings_manager.settings).session
         self.base_url = Config.SERIES_URL
         self.scraper = SeriesScraper(self.session)
         self._cache = {}
@@ -296,41 +296,68 @@ class SeriesSearcher:
         
         return sorted(nums)
 
-    def select_series_host(self, content_item, lang: str) -> Optional[Dict]:
-        try:
-            res = self.session.get(content_item.url, timeout=Config.TIMEOUT)
-            res.raise_for_status()
-            soup = BeautifulSoup(res.text, 'html.parser')
-
-            if isinstance(content_item, Movie):
-                eng_title = soup.select_one('small.episodeEnglishTitle')
-                if eng_title:
-                    content_item.english_title = eng_title.text.strip()
-
-            lang_key = "1" if lang == "German" else "2"
-            hosts = []
-            
-            for link in soup.select('a.watchEpisode'):
+    def list_series_hosts(self, content_item, lang: str) -> List[Dict]:
+        """Streaming hosts offered for one episode/movie in *lang*, in page order"""
+        res = self.session.get(content_item.url, timeout=Config.TIMEOUT)
+        res.raise_for_status()
+        soup = BeautifulSoup(res.text, 'html.parser')
+
+        if isinstance(content_item, Movie):
+            eng_title = soup.select_one('small.episodeEnglishTitle')
+            if eng_title:
+                content_item.english_title = eng_title.text.strip()
+
+        lang_key = "1" if lang == "German" else "2"
+        hosts = []
+
+        for link in soup.select('a.watchEpisode'):
+            parent = link.find_parent('li')
+            if parent and parent.get('data-lang-key') == lang_key:
+                icon = link.select_one('i[class*="icon"]')
+                host_name = next((cls.replace('icon-', '').title()
+                                for cls in icon.get('class', [])
+                                if cls != 'icon'), "Unknown")
+                href = urljoin(self.base_url, link['href']) if not link['href'].startswith('http') else link['href']
+                hosts.append({'name': host_name, 'url': href})
+
+        if not hosts:
+            for link in soup.select('a[href*="/redirect/"]'):
                 parent = link.find_parent('li')
                 if parent and parent.get('data-lang-key') == lang_key:
-                    icon = link.select_one('i[class*="icon"]')
-                    host_name = next((cls.replace('icon-', '').title() 
-                                    for cls in icon.get('class', []) 
-                                    if cls != 'icon'), "Unknown")
                     href = urljoin(self.base_url, link['href']) if not link['href'].startswith('http') else link['href']
-                    hosts.append({'name': host_name, 'url': href})
+                    hosts.append({'name': 'Stream', 'url': href})
+        return hosts
+
+    def resolve_item_host(self, content_item, lang: str, preference: Dict) -> Optional[Dict]:
+        """
+        Non-interactive host choice for one more item of a selection: the host picked
+        for the first item (and its failover ranking) decides the order here.
+        """
+        try:
+            hosts = self.list_series_hosts(content_item, lang)
+        except Exception as e:
+            self.console.print(f"[red]Host lookup failed for {content_item.title}: {e}[/red]")
+            return None
+        if not hosts:
+            return None
 
-            if not hosts:
-                for link in soup.select('a[href*="/redirect/"]'):
-                    parent = link.find_parent('li')
-                    if parent and parent.get('data-lang-key') == lang_key:
-                        href = urljoin(self.base_url, link['href']) if not link['href'].startswith('http') else link['href']
-                        hosts.append({'name': 'Stream', 'url': href})
+        ranking = [preference['name'].lower()] + [host['name'].lower() for host in preference.get('failover', [])]
+        hosts.sort(key=lambda host: ranking.index(host['name'].lower()) if host['name'].lower() in ranking
+                   else len(ranking))
+        chosen = dict(hosts[0])
+        chosen['failover'] = hosts[1:]
+        return chosen
 
+    def select_series_host(self, content_item, lang: str) -> Optional[Dict]:
+        try:
+            hosts = self.list_series_hosts(content_item, lang)
             if not hosts:
                 return None
 
             preferred_host = self.settings_manager.settings.get('default_host', '')
+            if self.settings_manager.settings.get('host_racing', False) and len(hosts) > 1:
+                return self._race_hosts(hosts, preferred_host)
+
             if preferred_host:
                 for host in hosts:
                     if host['name'].lower() == preferred_host.lower():
@@ -358,4 +385,33 @@ class SeriesSearcher:
 
         except Exception as e:
             self.console.print(f"[red]Host selection error: {e}[/red]")
-            return None
\ No newline at end of file
+            return None
+
+    def _race_hosts(self, hosts: List[Dict], preferred_host: str = '') -> Dict:
+        """Race the top hosts and return the fastest, with the rest ranked under 'failover'"""
+        # The preferred host always makes the cut
+        hosts = sorted(hosts, key=lambda host: host['name'].lower() != preferred_host.lower())
+        top_k = self.settings_manager.settings.get('race_top_k', 3)
+
+        with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), transient=True) as progress:
+            progress.add_task(f"Racing {min(top_k, len(hosts))} hosts...", total=None)
+            ranked = race_hosts(hosts, top_k)
+
+        table = Table(title="Host Race", show_header=True, header_style="bold blue")
+        table.add_column("Host", style="white")
+        table.add_column("TTFB", justify="right")
+        table.add_column("Speed", justify="right")
+        for result in ranked:
+            if result.ok:
+                table.add_row(result.host['name'], f"{result.ttfb * 1000:.0f} ms",
+                              f"{result.throughput / 1024 / 1024:.2f} MB/s")
+            elif result.error:
+                table.add_row(result.host['name'], "-", f"[red]{result.error[:40]}[/red]")
+            else:
+                table.add_row(result.host['name'], "-", "[dim]not raced[/dim]")
+        self.console.print(table)
+
+        winner = dict(ranked[0].host)
+        winner['failover'] = [result.host for result in ranked[1:]]
+        self.console.print(f"[green]Using {winner['name']}[/green]")
+        return winner
\ No newline at end of file
@@ -0,0 +1,427 @@
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from rich.console import Console
+
+from network import downloader as threaded, politeness
+from network.hls import (SEGMENT_ESTIMATE, HLSError, check_encryption, decrypt_segment, finalize_stream,
+                         parse_master_playlist, parse_media_playlist)
+from network.http_client import get_client
+from network.membudget import budget
+from network.progress import hub as progress_hub
+from network.probe import Probe, clear_cache as clear_probe_cache, get_cached, remember
+from network.ranges import RangeScheduler, RangesNotSupported
+from network.ratelimit import limiter
+from network.resume import DownloadState
+from network.writer import disk_writer
+from network.verify import PieceHasher, finalize_download
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency, thread mode is used without it
+    aiohttp = None
+
+
+def is_available() -> bool:
+    return aiohttp is not None
+
+
+class AsyncDownloadEngine:
+    """
+    asyncio download engine: every range and segment request of every file
+    runs on one event loop and shares one bounded connection pool.
+    Page resolution still uses the threaded resolver in a small thread pool.
+    """
+
+    def __init__(self, max_connections: int = 64, max_per_host: int = None, range_workers: int = 8,
+                 segment_workers: int = 8, resolve_workers: int = 4, io_workers: int = 4, console: Console = None):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for the asyncio engine (pip install aiohttp)")
+        self.client = get_client()
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host or self.client.pool_size
+        self.range_workers = range_workers
+        self.segment_workers = segment_workers
+        self.console = console or progress_hub.console
+        self._resolver = ThreadPoolExecutor(max_workers=resolve_workers, thread_name_prefix='async-resolve')
+        # Disk writes, closes, decryption and finalizing get their own threads, so slow resolves never hold them up
+        self._io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='async-io')
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host,
+                                         ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=None, connect=10, sock_read=self.client.timeout)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._resolver.shutdown(wait=False)
+        self._io.shutdown(wait=True)
+
+    def _headers(self, url, referer_url=None):
+        """Browser headers plus whatever cookies the shared requests session holds for *url*"""
+        headers = threaded.get_browser_headers(referer_url)
+        cookie = self.client.cookie_header(url)
+        if cookie:
+            headers['Cookie'] = cookie
+        return headers
+
+    async def _in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._resolver, func, *args)
+
+    async def _on_io_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, func, *args)
+
+    async def download(self, URL, report=None, filename=None) -> bool:
+        """Same contract as downloader.download(): resolve the host page, then transfer"""
+        report = report or threaded._no_report
+        try:
+            report('resolving')
+            source = await self._in_thread(threaded.resolve_cached, URL)
+            if not source:
+                report('failed', error='no media source found')
+                return False
+
+            link, referer = source["url"], source["referer"]
+            filename = filename or source["filename"]
+            report('downloading', target=os.path.abspath(filename))
+            if source["kind"] == "hls" and '.m3u8' in link:
+                success = await self.download_hls(link, filename, referer)
+            else:
+                success = await self.download_fast(link, filename, referer)
+
+            if not success:
+                self.console.print("[yellow][!] Falling back to YoutubeDL...[/yellow]")
+                success = await self._in_thread(threaded.download_with_youtubedl, link, filename, source["headers"])
+            if not success:
+                await self._in_thread(threaded.forget_if_revoked, URL, source)
+        except Exception as e:
+            report('failed', error=str(e) or type(e).__name__)
+            raise
+        size = os.path.getsize(filename) if success and os.path.exists(filename) else 0
+        report('done' if success else 'failed', bytes=size, error='' if success else 'download failed')
+        return success
+
+    async def download_many(self, urls: List[str], concurrency: int = 4,
+                            reporters: Dict[str, Callable] = None) -> Dict[str, bool]:
+        """Download many host URLs with at most *concurrency* resolved at once"""
+        semaphore = asyncio.Semaphore(concurrency)
+        reporters = reporters or {}
+        results = {}
+
+        async def run(url):
+            async with semaphore:
+                try:
+                    results[url] = await self.download(url, reporters.get(url))
+                except Exception as e:
+                    self.console.print(f"[red][!] Error downloading {url}: {e}[/red]")
+                    results[url] = False
+
+        await asyncio.gather(*(run(url) for url in urls))
+        clear_probe_cache()
+        return results
+
+    async def probe(self, url, headers) -> Probe:
+        """Async counterpart of probe.probe_url(), sharing its per-job cache"""
+        cached = get_cached(url)
+        if cached:
+            return cached
+        await politeness.scheduler.await_turn(url)
+        async with self._session.head(url, headers=headers, allow_redirects=True) as r:
+            probe = Probe.from_headers(url, str(r.url), r.status, r.headers)
+        if probe.status != 200:
+            await politeness.scheduler.await_turn(url)
+            async with self._session.get(url, headers=headers) as r:
+                probe = Probe.from_headers(url, str(r.url), r.status, r.headers)
+        return remember(probe)
+
+    async def download_fast(self, url, filename, referer_url=None, probe=None) -> bool:
+        """Parallel range download with sequential fallback, like downloader.download_fast()"""
+        headers = self._headers(url, referer_url)
+        try:
+            if probe is None:
+                probe = await self.probe(url, headers)
+
+            if probe.size > 8 * 1024 * 1024 and probe.supports_ranges:
+                if await self._download_ranges(url, filename, headers, probe):
+                    return True
+            return await self._download_sequential(url, filename, headers, probe)
+        except Exception as e:
+            self.console.print(f"[red][!] Download failed: {e}[/red]")
+            return False
+
+    async def _download_ranges(self, url, filename, headers, probe) -> bool:
+        part_path = filename + '.part'
+        total_size = probe.size
+        etag = probe.etag
+        last_modified = probe.last_modified
+
+        state = DownloadState.load(part_path)
+        if state and state.matches(url, total_size, etag, last_modified):
+            missing = state.missing_ranges()
+            output = disk_writer.open(part_path)
+        else:
+            state = DownloadState(part_path, url, total_size, etag, last_modified)
+            output = disk_writer.open(part_path, total_size, create=True)
+            state.save()
+            missing = [(0, total_size - 1)]
+
+        def on_written(offset, length):
+            state.mark_done(offset, offset + length - 1)
+            state.save(force=False)
+
+        scheduler = RangeScheduler(missing, align=PieceHasher().block_size)
+        hasher = PieceHasher(total_size)
+        transfer = progress_hub.transfer(os.path.basename(filename), total_size, state.completed_bytes())
+
+        # The loop only receives; disk writes happen on the writer thread
+        async def fetch(claim):
+            range_headers = dict(headers, Range=f'bytes={claim.pos}-{claim.end}')
+            async with self._session.get(probe.final_url, headers=range_headers) as r:
+                if r.status == 200:
+                    raise RangesNotSupported("Server ignored the Range header")
+                if r.status != 206:
+                    raise Exception(f"Server returned status {r.status}")
+                blocks = hasher.stream(claim.pos)
+                async for data in r.content.iter_chunked(512 * 1024):
+                    data = data[:scheduler.clip(claim, len(data))]
+                    if data:
+                        await output.awrite(claim.pos, data, on_written)
+                        blocks.update(data)
+                        scheduler.advance(claim, len(data))
+                        transfer.advance(len(data))
+                        await limiter.athrottle(probe.final_url, len(data))
+                    if claim.done:
+                        break
+            if not claim.done:
+                raise Exception(f"Connection closed with {claim.remaining} bytes left")
+
+        async def worker():
+            while True:
+                claim, finished, wait_for = scheduler.poll()
+                if finished:
+                    return
+                if claim is None:
+                    await asyncio.sleep(wait_for if wait_for is not None else 0.05)
+                    continue
+                try:
+                    await fetch(claim)
+                    scheduler.complete(claim)
+                except RangesNotSupported as e:
+                    scheduler.abort(claim, e)
+                except Exception as e:
+                    scheduler.fail(claim, e)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.range_workers)))
+        finally:
+            transfer.close(not scheduler.failed)
+            await self._on_io_thread(output.close)
+
+        state.save()
+        if scheduler.failed or state.missing_ranges():
+            self.console.print(f"[red][!] Parallel download failed: {scheduler.last_error}[/red]")
+            return False
+
+        state.remove()
+        return await self._on_io_thread(finalize_download, part_path, filename, total_size, hasher,
+                                     self.console.print)
+
+    async def _download_sequential(self, url, filename, headers, probe) -> bool:
+        part_path = filename + '.part'
+        # Continue after the bytes a failed range download already wrote, as downloader.download_fast() does
+        state = DownloadState.load(part_path)
+        resume_from = 0
+        if state and state.matches(url, probe.size, probe.etag, probe.last_modified):
+            resume_from = state.contiguous_prefix()
+
+        request_headers = dict(headers, Range=f'bytes={resume_from}-') if resume_from else headers
+        if not resume_from:
+            await politeness.scheduler.await_turn(probe.final_url)
+        async with self._session.get(probe.final_url, headers=request_headers) as r:
+            r.raise_for_status()
+            if r.status != 206:
+                resume_from = 0
+            total_size = resume_from + int(r.headers.get('Content-Length', 0))
+
+            if resume_from:
+                output = disk_writer.open(part_path)
+            else:
+                # A fresh file: a sidecar left by the range attempt would describe bytes that are gone
+                DownloadState.discard(part_path)
+                state = None
+                output = disk_writer.open(part_path, total_size, create=True)
+                if total_size > 0:
+                    state = DownloadState(part_path, url, total_size, r.headers.get('ETag', ''),
+                                          r.headers.get('Last-Modified', ''))
+                    state.save()
+
+            def on_written(offset, length):
+                if state:
+                    state.mark_done(offset, offset + length - 1)
+                    state.save(force=False)
+
+            hasher = PieceHasher(total_size)
+            blocks = hasher.stream(resume_from)
+            offset = resume_from
+            try:
+                with progress_hub.transfer(os.path.basename(filename), total_size, resume_from) as transfer:
+                    async for data in r.content.iter_chunked(2 * 1024 * 1024):
+                        await output.awrite(offset, data, on_written)
+                        blocks.update(data)
+                        offset += len(data)
+                        transfer.advance(len(data))
+                        await limiter.athrottle(probe.final_url, len(data))
+            finally:
+                await self._on_io_thread(output.close)
+
+        if state:
+            state.save()
+            if state.missing_ranges():
+                self.console.print("[red][!] Download incomplete, progress kept for resume[/red]")
+                return False
+            state.remove()
+        return await self._on_io_thread(finalize_download, part_path, filename, total_size, hasher,
+                                     self.console.print)
+
+    async def _get_bytes(self, url, headers, byterange=None, retries=3, paced=False) -> bytes:
+        if byterange:
+            offset, length = byterange
+            headers = dict(headers, Range=f'bytes={offset}-{offset + length - 1}')
+        last_error = None
+        for attempt in range(retries):
+            try:
+                # Playlists and keys are paced per host like the threaded path; segments only by bandwidth
+                if paced:
+                    await politeness.scheduler.await_turn(url)
+                async with self._session.get(url, headers=headers) as r:
+                    r.raise_for_status()
+                    data = await r.read()
+                await limiter.athrottle(url, len(data))
+                return data
+            except Exception as e:
+                last_error = e
+                await asyncio.sleep(0.5 * (2 ** attempt))
+        raise HLSError(f"Failed to fetch {url}: {last_error}")
+
+    async def download_hls(self, url, filename, referer_url=None) -> bool:
+        """Concurrent HLS segment download, written in playlist order"""
+        headers = self._headers(url, referer_url)
+        try:
+            text = (await self._get_bytes(url, headers, paced=True)).decode('utf-8', errors='replace')
+            if '#EXT-X-STREAM-INF' in text:
+                variants = parse_master_playlist(text, url)
+                if not variants:
+                    raise HLSError("Master playlist has no variants")
+                url = max(variants, key=lambda v: v['bandwidth'])['url']
+                text = (await self._get_bytes(url, headers, paced=True)).decode('utf-8', errors='replace')
+
+            segments, init_segment = parse_media_playlist(text, url)
+            if not segments:
+                raise HLSError("Media playlist has no segments")
+            check_encryption(segments)
+
+            keys = {}
+            key_lock = asyncio.Lock()
+
+            async def fetch(segment):
+                data = await self._get_bytes(segment.url, headers, segment.byterange)
+                if segment.key:
+                    async with key_lock:
+                        if segment.key.uri not in keys:
+                            keys[segment.key.uri] = await self._get_bytes(segment.key.uri, headers, paced=True)
+                    iv = segment.key.iv or segment.sequence.to_bytes(16, 'big')
+                    data = await self._on_io_thread(decrypt_segment, data, keys[segment.key.uri], iv)
+                return data
+
+            part_path = filename + '.part'
+            window = self.segment_workers
+            # Hashed on the I/O thread as it is written, like the threaded HLS downloader
+            hasher = PieceHasher()
+            blocks = hasher.stream(0)
+
+            def write(data):
+                f.write(data)
+                blocks.update(data)
+
+            with progress_hub.transfer(os.path.basename(filename)) as transfer, open(part_path, 'wb') as f:
+                if init_segment:
+                    await self._on_io_thread(write, await self._get_bytes(init_segment.url, headers,
+                                                                       init_segment.byterange))
+                in_flight = deque()  # (task, bytes reserved for it)
+                next_index = 0
+                written = 0
+                try:
+                    while next_index < len(segments) or in_flight:
+                        while next_index < len(segments) and len(in_flight) < window:
+                            charge = transfer.completed // written if written else SEGMENT_ESTIMATE
+                            if not in_flight:
+                                await budget.areserve(charge)
+                            elif not budget.try_reserve(charge):
+                                break
+                            in_flight.append((asyncio.ensure_future(fetch(segments[next_index])), charge))
+                            next_index += 1
+                        task, charge = in_flight.popleft()
+                        try:
+                            data = await task
+                            # Off the loop, so a slow disk doesn't stall the other transfers
+                            await self._on_io_thread(write, data)
+                        finally:
+                            budget.release(charge)
+                        written += 1
+                        transfer.advance(len(data))
+                        transfer.set_total(transfer.completed * len(segments) // written)
+                except BaseException:
+                    for task, charge in in_flight:
+                        task.cancel()
+                        budget.release(charge)
+                    raise
+
+            await self._on_io_thread(finalize_stream, part_path, filename, self.console.print, hasher)
+            return True
+        except Exception as e:
+            self.console.print(f"[red][!] HLS download failed: {e}[/red]")
+            return False
+
+
+def download(URL, report=None, filename=None) -> bool:
+    """Download one host URL on the asyncio engine, or in thread mode without aiohttp"""
+    if not is_available():
+        return threaded.download(URL, report, filename)
+
+    async def run():
+        async with AsyncDownloadEngine() as engine:
+            return await engine.download(URL, report, filename)
+
+    return asyncio.run(run())
+
+
+def download_fast(url, filename, referer_url=None) -> bool:
+    """Async counterpart of downloader.download_fast()"""
+    if not is_available():
+        return threaded.download_fast(url, filename, referer_url)
+
+    async def run():
+        async with AsyncDownloadEngine() as engine:
+            return await engine.download_fast(url, filename, referer_url)
+
+    return asyncio.run(run())
+
+
+def download_many(urls: List[str], concurrency: int = 4, reporters: Dict[str, Callable] = None) -> Dict[str, bool]:
+    """Download a whole list on a single event loop; *reporters* maps URLs to job state callbacks"""
+    reporters = reporters or {}
+    if not is_available():
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return dict(zip(urls, executor.map(lambda url: threaded.download(url, reporters.get(url)), urls)))
+
+    async def run():
+        async with AsyncDownloadEngine() as engine:
+            return await engine.download_many(urls, concurrency, reporters)
+
+    return asyncio.run(run())
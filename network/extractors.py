@@ -0,0 +1,530 @@
+"""
+Source extractors for host pages.
+
+Every extractor gets the same PageView, built from a single parse of the
+page, and returns a source dict like {"mp4": url} or {"hls": url}, or None.
+"""
+import base64
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+_M3U8_RE = re.compile(r'(https?://[^"\']+\.m3u8[^"\'\s]*)')
+_MP4_RE = re.compile(r'(https?://[^"\']+\.mp4[^"\'\s]*)')
+_DECODED_MP4_RE = re.compile(r'(https?://[^\s"]+\.mp4[^\s"]*)')
+_DECODED_M3U8_RE = re.compile(r'(https?://[^\s"]+\.m3u8[^\s"]*)')
+_BASE64_RE = re.compile(r'base64[,:]([A-Za-z0-9+/=]+)')
+_A168C_RE = re.compile(r"a168c\s*=\s*'([^']+)'", re.DOTALL)
+_MKGMA_RE = re.compile(r'MKGMa="(.*?)"', re.DOTALL)
+
+_SOURCE_PATTERNS = [
+    "var sources",
+    "sources =",
+    "sources:",
+    "\"sources\":",
+    "'sources':"
+]
+
+
+# Method-8 dedicated helpers (obfuscated JSON inside <script type="application/json">) | @Domkeykong
+def _rot13(text: str) -> str:
+    """Apply ROT13 cipher (letters only)."""
+    out = []
+    for ch in text:
+        o = ord(ch)
+        if 65 <= o <= 90:
+            out.append(chr(((o - 65 + 13) % 26) + 65))
+        elif 97 <= o <= 122:
+            out.append(chr(((o - 97 + 13) % 26) + 97))
+        else:
+            out.append(ch)
+    return ''.join(out)
+
+
+def _replace_patterns(txt: str) -> str:
+    """Strip marker substrings used as obfuscation separators."""
+    for pat in ['@$', '^^', '~@', '%?', '*~', '!!', '#&']:
+        txt = txt.replace(pat, '')
+    return txt
+
+
+def _shift_chars(text: str, shift: int) -> str:
+    """Shift character code-points by *-shift* (decode)."""
+    return ''.join(chr(ord(c) - shift) for c in text)
+
+
+def _safe_b64_decode(s: str) -> str:
+    """Base64 decode with safe padding and utf-8 fallback."""
+    pad = len(s) % 4
+    if pad:
+        s += '=' * (4 - pad)
+    return base64.b64decode(s).decode('utf-8', errors='replace')
+
+
+def deobfuscate_embedded_json(raw_json: str):
+    """Return a dict or str extracted from the obfuscated JSON array found in <script type="application/json">."""
+    try:
+        arr = json.loads(raw_json)
+        if not (isinstance(arr, list) and arr and isinstance(arr[0], str)):
+            return None
+        obf = arr[0]
+    except json.JSONDecodeError:
+        return None
+
+    try:
+        step1 = _rot13(obf)
+        step2 = _replace_patterns(step1)
+        step3 = _safe_b64_decode(step2)
+        step4 = _shift_chars(step3, 3)
+        step5 = step4[::-1]
+        step6 = _safe_b64_decode(step5)
+        try:
+            return json.loads(step6)  # ideally a dict with direct_access_url / source
+        except json.JSONDecodeError:
+            return step6  # return plain string for fallback regex search
+    except Exception:
+        return None
+
+
+def is_bait_source(source: str) -> bool:
+    """Return True if *source* looks like a known test/bait video."""
+    bait_filenames = [
+        "BigBuckBunny",
+        "Big_Buck_Bunny_1080_10s_5MB",
+        "bbb.mp4",
+        # Add more bait filenames as needed
+    ]
+    bait_domains = [
+        "test-videos.co.uk",
+        "sample-videos.com",
+        "commondatastorage.googleapis.com",
+        # Add more bait domains as needed
+    ]
+    if any(fn.lower() in source.lower() for fn in bait_filenames):
+        return True
+    parsed = urlparse(source)
+    if any(dom in parsed.netloc for dom in bait_domains):
+        return True
+    return False
+
+
+# Function to clean and pad base64 safely
+def clean_base64(s):
+    try:
+        s = s.replace('\\', '')  # remove literal backslashes
+        missing_padding = len(s) % 4
+        if missing_padding:
+            s += '=' * (4 - missing_padding)
+        # Validate if the string is valid base64
+        base64.b64decode(s, validate=True)
+        return s
+    except (base64.binascii.Error, ValueError) as e:
+        print(f"[!] Invalid base64 string: {e}")
+        return None
+
+
+def _source_from_decoded(decoded) -> Optional[Dict]:
+    """Turn a decoded JSON object or string into a source dict"""
+    if isinstance(decoded, dict):
+        if 'direct_access_url' in decoded:
+            print("[+] Found direct .mp4 URL in JSON.")
+            return {"mp4": decoded['direct_access_url']}
+        if 'source' in decoded:
+            print("[+] Found fallback .m3u8 URL in JSON.")
+            return {"hls": decoded['source']}
+        if any(k in decoded for k in ("mp4", "hls")):
+            print("[+] Found media URL in JSON.")
+            return decoded
+        return None
+    if isinstance(decoded, str):
+        mp4_match = _DECODED_MP4_RE.search(decoded)
+        if mp4_match:
+            print("[+] Found base64 encoded MP4 URL.")
+            return {"mp4": mp4_match.group(1)}
+        m3u8_match = _DECODED_M3U8_RE.search(decoded)
+        if m3u8_match:
+            print("[+] Found base64 encoded HLS (m3u8) URL.")
+            return {"hls": m3u8_match.group(1)}
+    return None
+
+
+REDIRECT_PATTERNS = [
+    "window.location.href = '",
+    "window.location = '",
+    "location.href = '",
+    "window.location.replace('",
+    "window.location.assign('",
+    "window.location=\"",
+    "window.location.href=\""
+]
+
+
+class PageView:
+    """A host page parsed once and indexed for every extractor"""
+
+    def __init__(self, url: str, text: str, content: bytes = None):
+        self.url = url
+        self.host = urlparse(url).netloc.lower()
+        self.text = text
+        self.soup = BeautifulSoup(content if content is not None else text, 'html.parser')
+
+        self.scripts: List[str] = []       # inline script bodies
+        self.json_scripts: List[str] = []  # <script type="application/json"> bodies
+        self.videos = []
+        self.iframes: List[str] = []
+        self.meta: Dict[str, str] = {}
+
+        # Single walk over the tags every extractor cares about
+        for tag in self.soup.find_all(['script', 'video', 'iframe', 'meta']):
+            if tag.name == 'script':
+                if tag.string:
+                    self.scripts.append(tag.string)
+                    if tag.get('type') == 'application/json':
+                        self.json_scripts.append(tag.string.strip())
+            elif tag.name == 'video':
+                self.videos.append(tag)
+            elif tag.name == 'iframe':
+                if tag.get('src'):
+                    self.iframes.append(tag['src'])
+            else:
+                key = tag.get('property') or tag.get('name')
+                if key and tag.get('content') and key not in self.meta:
+                    self.meta[key] = tag['content']
+
+    @property
+    def redirect(self) -> Optional[str]:
+        """Absolute target of a JavaScript redirect in any inline script"""
+        for script in self.scripts:
+            for pattern in REDIRECT_PATTERNS:
+                i0 = script.find(pattern)
+                if i0 == -1:
+                    continue
+                closing_quote = "'" if pattern.endswith("'") else '"'
+                i1 = script.find(closing_quote, i0 + len(pattern))
+                if i1 > i0:
+                    return urljoin(self.url, script[i0 + len(pattern):i1])
+        return None
+
+    @property
+    def iframe_urls(self) -> List[str]:
+        """Iframe sources as absolute URLs"""
+        urls = []
+        for src in self.iframes:
+            if src.startswith("//"):
+                urls.append("https:" + src)
+            else:
+                urls.append(urljoin(self.url, src))
+        return urls
+
+    @property
+    def title(self) -> Optional[str]:
+        for meta_tag in ['og:title', 'twitter:title', 'title']:
+            if self.meta.get(meta_tag):
+                return self.meta[meta_tag]
+        if self.soup.title and self.soup.title.string:
+            return self.soup.title.string
+        return None
+
+
+class Extractor:
+    def __init__(self, name: str, func: Callable[[PageView], Optional[Dict]], confident: bool):
+        self.name = name
+        self.func = func
+        self.confident = confident
+
+
+EXTRACTORS: List[Extractor] = []
+
+
+def extractor(name: str, confident: bool = True):
+    """Register an extractor; unconfident ones only win if no confident one matches"""
+    def register(func):
+        EXTRACTORS.append(Extractor(name, func, confident))
+        return func
+    return register
+
+
+class ExtractorStats:
+    """
+    Per-host hit counts used to try the most successful extractors first. With a
+    *path* the counts are kept across runs, next to the resolution cache.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hits = defaultdict(lambda: defaultdict(int))
+        self._tries = defaultdict(lambda: defaultdict(int))
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            for table, saved in ((self._hits, data.get('hits', {})), (self._tries, data.get('tries', {}))):
+                for host, counts in saved.items():
+                    table[host].update({name: int(count) for name, count in counts.items()})
+        except (OSError, ValueError, AttributeError, TypeError):
+            self._hits.clear()
+            self._tries.clear()
+
+    def save(self):
+        """Write the counts if anything changed since the last save"""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            data = {'hits': self._hits, 'tries': self._tries}
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def record(self, host: str, name: str, hit: bool):
+        with self._lock:
+            self._tries[host][name] += 1
+            if hit:
+                self._hits[host][name] += 1
+            self._dirty = True
+
+    def ordered(self, host: str, extractors: List[Extractor]) -> List[Extractor]:
+        with self._lock:
+            hits, tries = self._hits[host], self._tries[host]
+
+            def rate(ex):
+                return hits[ex.name] / tries[ex.name] if tries[ex.name] else 0.0
+
+            # sorted() is stable, so extractors without history keep registration order
+            return sorted(extractors, key=rate, reverse=True)
+
+
+# Next to where SeriesDL was started, like the resolution cache
+STATS_FILE = os.path.abspath('extractor_stats.json')
+stats = ExtractorStats(STATS_FILE)
+
+
+def extract_source(page: PageView) -> Optional[Dict]:
+    """Run the extractors against *page* and stop at the first confident match"""
+    try:
+        return _run_extractors(page)
+    finally:
+        stats.save()
+
+
+def _run_extractors(page: PageView) -> Optional[Dict]:
+    fallback = None
+    for ex in stats.ordered(page.host, EXTRACTORS):
+        try:
+            result = ex.func(page)
+        except Exception as e:
+            print(f"[!] Extractor {ex.name} failed: {e}")
+            result = None
+        stats.record(page.host, ex.name, bool(result))
+        if not result:
+            continue
+        if ex.confident:
+            return result
+        if fallback is None:
+            fallback = result
+    return fallback
+
+
+# Method 1: Look for "var sources" pattern
+@extractor("var_sources")
+def extract_var_sources(page: PageView) -> Optional[Dict]:
+    for script in page.scripts:
+        if "var sources" not in script:
+            continue
+        try:
+            source = script[script.index("var sources"):]
+            source = source[:source.index(";")]
+            source = source.replace("var sources = ", "")
+            source = source.replace("\'", "\"")
+            source = source.replace("\n", "")
+            source = source.replace("\\", "")
+
+            # Check for "Bait" sources
+            if is_bait_source(source):
+                return None
+
+            # Clean up JSON for parsing (trailing comma)
+            source = "".join(source.rsplit(",", 1))
+            source_json = json.loads(source)
+            print("[+] Found sources using var sources pattern")
+            return source_json
+        except (ValueError, json.JSONDecodeError) as e:
+            print(f"[!] Error parsing sources: {e}")
+            return None
+    return None
+
+
+# Method 2: Look for script tags with sources
+@extractor("script_sources")
+def extract_script_sources(page: PageView) -> Optional[Dict]:
+    for script_text in page.scripts:
+        for pattern in _SOURCE_PATTERNS:
+            start_idx = script_text.find(pattern)
+            if start_idx == -1:
+                continue
+
+            # Find the opening brace
+            brace_idx = script_text.find("{", start_idx)
+            if brace_idx == -1:
+                continue
+
+            # Count braces to find the matching closing brace
+            brace_count = 1
+            end_idx = brace_idx + 1
+            while brace_count > 0 and end_idx < len(script_text):
+                if script_text[end_idx] == "{":
+                    brace_count += 1
+                elif script_text[end_idx] == "}":
+                    brace_count -= 1
+                end_idx += 1
+
+            if brace_count == 0:
+                json_str = script_text[brace_idx:end_idx].replace("'", "\"")
+                try:
+                    source_json = json.loads(json_str)
+                    print(f"[+] Found sources using pattern: {pattern}")
+                    return source_json
+                except json.JSONDecodeError:
+                    pass
+    return None
+
+
+# Method 3: Look for data attributes in video tags
+@extractor("video_tag")
+def extract_video_tag(page: PageView) -> Optional[Dict]:
+    for video in page.videos:
+        src = video.get("src")
+        if src:
+            if is_bait_source(src):
+                continue
+            print(f"[+] Found direct video source: {src}")
+            return {"mp4": src}
+
+        # Check for source tags inside video
+        for source_tag in video.find_all("source"):
+            src = source_tag.get("src")
+            if not src or is_bait_source(src):
+                continue
+            type_attr = source_tag.get("type", "")
+            print(f"[+] Found video source from source tag: {src}")
+            if "mp4" in type_attr:
+                return {"mp4": src}
+            if "m3u8" in type_attr or "hls" in type_attr:
+                return {"hls": src}
+            return {"mp4": src}  # Default to mp4
+    return None
+
+
+# Method 4: Look for m3u8 or mp4 URLs in the page
+@extractor("page_urls", confident=False)
+def extract_page_urls(page: PageView) -> Optional[Dict]:
+    m3u8_match = _M3U8_RE.search(page.text)
+    if m3u8_match:
+        if is_bait_source(m3u8_match.group(1)):
+            print(f"[!] Ignoring bait source: {m3u8_match.group(1)}")
+        else:
+            print(f"[+] Found HLS URL: {m3u8_match.group(1)}")
+            return {"hls": m3u8_match.group(1)}
+
+    mp4_match = _MP4_RE.search(page.text)
+    if mp4_match:
+        if is_bait_source(mp4_match.group(1)):
+            print(f"[!] Ignoring bait source: {mp4_match.group(1)}")
+        else:
+            print(f"[+] Found MP4 URL: {mp4_match.group(1)}")
+            return {"mp4": mp4_match.group(1)}
+    return None
+
+
+# Method 5: Look for base64 encoded sources
+@extractor("base64_urls", confident=False)
+def extract_base64_urls(page: PageView) -> Optional[Dict]:
+    for match in _BASE64_RE.finditer(page.text):
+        try:
+            decoded = base64.b64decode(match.group(1)).decode('utf-8')
+        except Exception:
+            continue
+        if '.mp4' in decoded:
+            print("[+] Found base64 encoded MP4 URL")
+            return {"mp4": decoded}
+        if '.m3u8' in decoded:
+            print("[+] Found base64 encoded HLS URL")
+            return {"hls": decoded}
+    return None
+
+
+# Method 6: Look for a168c encoded sources
+@extractor("a168c")
+def extract_a168c(page: PageView) -> Optional[Dict]:
+    match = _A168C_RE.search(page.text)
+    if not match:
+        return None
+    try:
+        cleaned = clean_base64(match.group(1))
+        decoded = base64.b64decode(cleaned).decode('utf-8')[::-1]
+        try:
+            return _source_from_decoded(json.loads(decoded))
+        except json.JSONDecodeError:
+            print("[-] Decoded string is not valid JSON. Trying fallback regex search...")
+            return _source_from_decoded(decoded)
+    except Exception as e:
+        print(f"[!] Failed to decode a168c string: {e}")
+        return None
+
+
+# Method 7: Look for MKGMa encoded sources
+# https://github.com/p4ul17/voe-dl/issues/33#issuecomment-2807006973
+@extractor("mkgma")
+def extract_mkgma(page: PageView) -> Optional[Dict]:
+    match = _MKGMA_RE.search(page.text)
+    if not match:
+        return None
+    try:
+        step1 = _rot13(match.group(1))
+        step2 = step1.replace('_', '')
+        step3 = base64.b64decode(step2).decode('utf-8')
+        step4 = _shift_chars(step3, 3)
+        step5 = step4[::-1]
+        decoded = base64.b64decode(step5).decode('utf-8')
+        try:
+            return _source_from_decoded(json.loads(decoded))
+        except json.JSONDecodeError:
+            print("[-] Decoded string is not valid JSON. Attempting fallback regex search...")
+            return _source_from_decoded(decoded)
+    except Exception as e:
+        print(f"[-] Error while decoding MKGMa string: {e}")
+        return None
+
+
+# Method 8: Obfuscated JSON in <script type="application/json"> tags
+@extractor("embedded_json")
+def extract_embedded_json(page: PageView) -> Optional[Dict]:
+    for candidate in page.json_scripts:
+        result = deobfuscate_embedded_json(candidate)
+        if result is None:
+            continue
+        try:
+            source_json = _source_from_decoded(result)
+        except Exception as e:
+            print(f"[!] Error parsing obfuscated JSON result: {e}")
+            source_json = None
+        if source_json:
+            return source_json
+    return None
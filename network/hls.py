@@ -0,0 +1,301 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from yt_dlp.aes import unpad_pkcs7
+
+from network import politeness
+from network.membudget import budget
+from network.ratelimit import limiter
+from network.verify import PieceHasher, record as record_verified, verify_file
+
+try:
+    from Cryptodome.Cipher import AES
+except ImportError:  # optional dependency; encrypted streams are left to YoutubeDL/ffmpeg without it
+    AES = None
+
+_ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+# Budget charge for a segment before any sizes are known; later ones are charged at the running average
+SEGMENT_ESTIMATE = 2 * 1024 * 1024
+
+
+class HLSError(Exception):
+    """Raised when a stream can't be handled by the native HLS downloader"""
+
+
+@dataclass
+class HLSKey:
+    method: str
+    uri: str = ''
+    iv: Optional[bytes] = None
+
+
+@dataclass
+class HLSSegment:
+    url: str
+    sequence: int
+    duration: float = 0.0
+    key: Optional[HLSKey] = None
+    byterange: Optional[tuple] = None  # (offset, length)
+
+
+def _parse_attributes(line: str) -> Dict[str, str]:
+    attrs = {}
+    for key, value in _ATTR_RE.findall(line.split(':', 1)[1] if ':' in line else ''):
+        attrs[key] = value.strip('"')
+    return attrs
+
+
+def parse_master_playlist(text: str, base_url: str) -> List[Dict]:
+    """Return the variants of a master playlist as dicts with bandwidth, resolution and url"""
+    variants = []
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF'):
+            attrs = _parse_attributes(line)
+            pending = {
+                'bandwidth': int(attrs.get('BANDWIDTH', '0') or 0),
+                'resolution': attrs.get('RESOLUTION', ''),
+            }
+        elif line and not line.startswith('#') and pending is not None:
+            pending['url'] = urljoin(base_url, line)
+            variants.append(pending)
+            pending = None
+    return variants
+
+
+def parse_media_playlist(text: str, base_url: str):
+    """Return (segments, init_segment) for a media playlist"""
+    segments = []
+    init_segment = None
+    sequence = 0
+    duration = 0.0
+    key = None
+    byterange = None
+    next_offset = 0
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#EXT-X-MEDIA-SEQUENCE'):
+            sequence = int(line.split(':', 1)[1])
+        elif line.startswith('#EXTINF'):
+            duration = float(line.split(':', 1)[1].split(',')[0] or 0)
+        elif line.startswith('#EXT-X-KEY'):
+            attrs = _parse_attributes(line)
+            method = attrs.get('METHOD', 'NONE')
+            if method == 'NONE':
+                key = None
+            else:
+                iv = attrs.get('IV')
+                key = HLSKey(method, urljoin(base_url, attrs.get('URI', '')),
+                             bytes.fromhex(iv[2:] if iv.lower().startswith('0x') else iv) if iv else None)
+        elif line.startswith('#EXT-X-MAP'):
+            attrs = _parse_attributes(line)
+            init_segment = HLSSegment(urljoin(base_url, attrs['URI']), -1)
+            if 'BYTERANGE' in attrs:
+                length, _, offset = attrs['BYTERANGE'].partition('@')
+                init_segment.byterange = (int(offset or 0), int(length))
+        elif line.startswith('#EXT-X-BYTERANGE'):
+            length, _, offset = line.split(':', 1)[1].partition('@')
+            offset = int(offset) if offset else next_offset
+            byterange = (offset, int(length))
+            next_offset = offset + int(length)
+        elif not line.startswith('#'):
+            segments.append(HLSSegment(urljoin(base_url, line), sequence, duration, key, byterange))
+            sequence += 1
+            duration = 0.0
+            byterange = None
+
+    return segments, init_segment
+
+
+def check_encryption(segments: List[HLSSegment]):
+    """Raise HLSError for encryption the native downloaders can't decrypt at full speed"""
+    for segment in segments:
+        if not segment.key:
+            continue
+        if segment.key.method != 'AES-128':
+            raise HLSError(f"Unsupported HLS encryption: {segment.key.method}")
+        if AES is None:
+            # The pure-Python AES fallback takes seconds per segment
+            raise HLSError("Encrypted HLS stream needs pycryptodomex (pip install pycryptodomex)")
+
+
+def decrypt_segment(data: bytes, key: bytes, iv: bytes) -> bytes:
+    """AES-128-CBC decrypt one segment and strip its PKCS#7 padding"""
+    return unpad_pkcs7(AES.new(key, AES.MODE_CBC, iv).decrypt(data))
+
+
+def finalize_stream(part_path: str, filename: str, log=print, hasher: Optional[PieceHasher] = None):
+    """
+    Move a finished stream into place, remuxing it into the target container when ffmpeg
+    is available. The result is staged next to the target and verified before an atomic
+    rename, so *filename* never exists half-written. *hasher* holds the blocks hashed while
+    the segments were written; it only applies when the stream is kept as written.
+    """
+    staged = part_path
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg and filename.lower().endswith(('.mp4', '.m4v', '.mkv')):
+        remuxed = filename + '.remux'
+        result = subprocess.run(
+            [ffmpeg, '-y', '-loglevel', 'error', '-i', part_path, '-c', 'copy', '-f',
+             'matroska' if filename.lower().endswith('.mkv') else 'mp4', remuxed],
+            capture_output=True, text=True
+        )
+        if result.returncode == 0:
+            os.remove(part_path)
+            staged = remuxed
+        else:
+            log(f"[!] ffmpeg remux failed, keeping raw stream: {result.stderr.strip()}")
+            if os.path.exists(remuxed):
+                os.remove(remuxed)
+
+    # The remux rewrites every byte, so a remuxed stream is verified (and hashed) once, in its final form
+    verified = verify_file(staged, hasher=hasher if staged == part_path else None)
+    if not verified.ok:
+        os.remove(staged)
+        raise HLSError(f"Verification failed: {verified.reason}")
+    os.replace(staged, filename)
+    record_verified(filename, verified)
+
+
+class HLSDownloader:
+    """Parallel HLS segment downloader writing segments to the output file in order"""
+
+    def __init__(self, session, headers: Dict, max_workers: int = 8, retries: int = 3, console=None):
+        self.session = session
+        self.headers = headers
+        self.max_workers = max_workers
+        self.retries = retries
+        self.console = console
+        self._keys = {}
+        self._keys_lock = threading.Lock()
+
+    def _print(self, message: str):
+        if self.console:
+            self.console.print(message)
+        else:
+            print(message)
+
+    def _get(self, url: str, byterange: Optional[tuple] = None, paced: bool = False) -> bytes:
+        headers = self.headers.copy()
+        if byterange:
+            offset, length = byterange
+            headers['Range'] = f'bytes={offset}-{offset + length - 1}'
+        last_error = None
+        for attempt in range(self.retries):
+            try:
+                # Segments are paced by the bandwidth limiter; playlists and keys by the per-host scheduler
+                if paced:
+                    r = self.session.get(url, headers=headers, timeout=30)
+                else:
+                    with politeness.scheduler.exempt():
+                        r = self.session.get(url, headers=headers, timeout=30)
+                r.raise_for_status()
+                limiter.throttle(url, len(r.content))
+                return r.content
+            except Exception as e:
+                last_error = e
+                time.sleep(0.5 * (2 ** attempt))
+        raise HLSError(f"Failed to fetch {url}: {last_error}")
+
+    def resolve_media_playlist(self, url: str):
+        """Follow a master playlist to its highest-bandwidth variant and parse it"""
+        text = self._get(url, paced=True).decode('utf-8', errors='replace')
+        if '#EXTM3U' not in text:
+            raise HLSError("Not an HLS playlist")
+
+        if '#EXT-X-STREAM-INF' in text:
+            variants = parse_master_playlist(text, url)
+            if not variants:
+                raise HLSError("Master playlist has no variants")
+            best = max(variants, key=lambda v: v['bandwidth'])
+            self._print(f"[*] Selected HLS variant {best['resolution'] or '?'} @ {best['bandwidth'] // 1000} kbps")
+            url = best['url']
+            text = self._get(url, paced=True).decode('utf-8', errors='replace')
+
+        segments, init_segment = parse_media_playlist(text, url)
+        if not segments:
+            raise HLSError("Media playlist has no segments")
+        check_encryption(segments)
+        return segments, init_segment
+
+    def _key_bytes(self, key: HLSKey) -> bytes:
+        with self._keys_lock:
+            if key.uri not in self._keys:
+                self._keys[key.uri] = self._get(key.uri, paced=True)
+            return self._keys[key.uri]
+
+    def fetch_segment(self, segment: HLSSegment) -> bytes:
+        data = self._get(segment.url, segment.byterange)
+        if segment.key:
+            iv = segment.key.iv or segment.sequence.to_bytes(16, 'big')
+            data = decrypt_segment(data, self._key_bytes(segment.key), iv)
+        return data
+
+    def download(self, url: str, filename: str, transfer=None) -> bool:
+        """Download every segment of *url* into *filename*, reporting bytes to a progress Transfer"""
+        segments, init_segment = self.resolve_media_playlist(url)
+        self._print(f"[*] Downloading {len(segments)} HLS segments with {self.max_workers} workers")
+
+        part_path = filename + '.part'
+        window = self.max_workers * 2  # bounds how many finished segments wait, within the memory budget
+
+        # Segments are hashed as they are written, so a stream kept as is isn't read back to verify it
+        hasher = PieceHasher()
+        blocks = hasher.stream(0)
+
+        def write(data):
+            f.write(data)
+            blocks.update(data)
+
+        with open(part_path, 'wb') as f, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if init_segment:
+                write(self._get(init_segment.url, init_segment.byterange))
+
+            in_flight = deque()  # (future, bytes reserved for it)
+            next_index = 0
+            written = 0
+            written_bytes = 0
+            try:
+                while next_index < len(segments) or in_flight:
+                    while next_index < len(segments) and len(in_flight) < window:
+                        charge = written_bytes // written if written else SEGMENT_ESTIMATE
+                        if not in_flight:
+                            budget.reserve(charge)
+                        elif not budget.try_reserve(charge):
+                            break  # drain what we hold first instead of waiting on our own reservations
+                        in_flight.append((executor.submit(self.fetch_segment, segments[next_index]), charge))
+                        next_index += 1
+                    # Segments complete out of order but are written strictly in playlist order
+                    future, charge = in_flight.popleft()
+                    try:
+                        data = future.result()
+                        write(data)
+                    finally:
+                        budget.release(charge)
+                    written += 1
+                    written_bytes += len(data)
+                    if transfer is not None:
+                        transfer.advance(len(data))
+                        # The playlist has no sizes; extrapolate from the segments so far
+                        transfer.set_total(transfer.completed * len(segments) // written)
+            except BaseException:
+                for future, charge in in_flight:
+                    future.cancel()
+                    budget.release(charge)
+                raise
+
+        finalize_stream(part_path, filename, self._print, hasher)
+        return True
@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from network import downloader
+from network.hls import HLSDownloader
+
+SAMPLE_BYTES = 512 * 1024
+# Hosts are ranked by the estimated time to fetch this much, which weighs TTFB against throughput
+RANK_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class RaceResult:
+    """How one streaming host did in a race"""
+    host: Dict
+    source: Optional[Dict] = None
+    ttfb: float = 0.0
+    throughput: float = 0.0  # bytes/s over the sample
+    error: str = ''
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.source is not None and not self.error
+
+    @property
+    def score(self) -> float:
+        """Seconds to fetch RANK_BYTES at the measured speed; lower is better"""
+        if not self.ok or self.throughput <= 0:
+            return float('inf')
+        return self.ttfb + RANK_BYTES / self.throughput
+
+
+def _sample_url(source: Dict) -> str:
+    """First media URL worth timing: the file itself, or the first segment of an HLS playlist"""
+    if source["kind"] == "hls" and '.m3u8' in source["url"]:
+        hls = HLSDownloader(downloader.session, downloader.get_browser_headers(source["referer"]), retries=1)
+        segments, init_segment = hls.resolve_media_playlist(source["url"])
+        return (init_segment or segments[0]).url
+    return source["url"]
+
+
+def measure_host(host: Dict, sample_bytes: int = SAMPLE_BYTES) -> RaceResult:
+    """Resolve one host page and time a short range request against its media"""
+    result = RaceResult(host=host)
+    try:
+        started = time.monotonic()
+        # Resolution goes through the resolve cache, so the winner's download skips it
+        result.source = downloader.resolve_cached(host['url'])
+        result.timings['resolve'] = time.monotonic() - started
+        if not result.source:
+            result.error = 'no source'
+            return result
+
+        url = _sample_url(result.source)
+        headers = downloader.get_browser_headers(result.source["referer"])
+        headers['Range'] = f'bytes=0-{sample_bytes - 1}'
+
+        started = time.monotonic()
+        with downloader.session.get(url, headers=headers, stream=True, timeout=15) as r:
+            r.raise_for_status()
+            received = 0
+            first_byte_at = None
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                if first_byte_at is None:
+                    first_byte_at = time.monotonic()
+                received += len(chunk)
+                if received >= sample_bytes:
+                    break
+        finished = time.monotonic()
+
+        if not received:
+            result.error = 'empty response'
+            return result
+        result.ttfb = first_byte_at - started
+        result.throughput = received / max(finished - first_byte_at, 1e-3)
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    return result
+
+
+def race_hosts(hosts: List[Dict], top_k: int = 3, sample_bytes: int = SAMPLE_BYTES) -> List[RaceResult]:
+    """
+    Measure the first *top_k* hosts in parallel. Returns every host ranked:
+    measured hosts fastest first, then the hosts that were not raced, then failed ones.
+    """
+    contenders = hosts[:max(1, top_k)]
+    with ThreadPoolExecutor(max_workers=len(contenders)) as executor:
+        results = list(executor.map(lambda host: measure_host(host, sample_bytes), contenders))
+
+    finished = sorted((result for result in results if result.ok), key=lambda result: result.score)
+    failed = [result for result in results if not result.ok]
+    return finished + [RaceResult(host=host) for host in hosts[len(contenders):]] + failed
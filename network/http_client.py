@@ -0,0 +1,134 @@
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+from network import politeness
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout and per-host pacing to every request"""
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        # Range requests belong to a download whose first request was already paced
+        if 'Range' not in request.headers:
+            politeness.scheduler.wait(request.url)
+        return super().send(request, **kwargs)
+
+
+def _timeout_adapter_class(base: type) -> type:
+    """_TimeoutAdapter on top of *base*, e.g. cloudscraper's CipherSuiteAdapter"""
+    if issubclass(_TimeoutAdapter, base):
+        return _TimeoutAdapter
+    return type(f'_Timeout{base.__name__}', (_TimeoutAdapter, base), {})
+
+
+class HttpClient:
+    """
+    Process-wide HTTP layer shared by search, scraping and downloading.
+    One session means one cookie jar and one set of warm keep-alive pools
+    for the whole search -> scrape -> resolve -> download flow.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.session = self._create_session()
+        self.session.headers.update(Config.DEFAULT_HEADERS)
+        # cloudscraper's https adapter carries the TLS cipher/ECDH fingerprint that gets past
+        # Cloudflare; our https adapters are built on its class and share its SSL context
+        tls_adapter = self.session.get_adapter('https://')
+        self._https_class = _timeout_adapter_class(type(tls_adapter))
+        self._https_kwargs = {name: getattr(tls_adapter, name) for name in
+                              ('ssl_context', 'cipherSuite', 'source_address', 'server_hostname', 'ecdhCurve')
+                              if hasattr(tls_adapter, name)}
+        self._lock = threading.Lock()
+        self._applied = None
+        self.pool_size = 20
+        self.timeout = Config.TIMEOUT
+        self.configure(settings or {})
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        try:
+            import cloudscraper
+            return cloudscraper.create_scraper()
+        except ImportError:
+            return requests.Session()
+
+    def configure(self, settings: Dict):
+        """Apply pool, retry and timeout settings; adapters are only replaced when these change"""
+        pool_size = int(settings.get('http_pool_size', 20))
+        retries = int(settings.get('retry_attempts', 3))
+        timeout = settings.get('timeout', Config.TIMEOUT)
+        host_pools = dict(settings.get('http_host_pools', {}) or {})
+
+        wanted = (pool_size, retries, timeout, tuple(sorted(host_pools.items())))
+        with self._lock:
+            if wanted == self._applied:
+                return
+            self._applied = wanted
+            self.pool_size = pool_size
+            self.timeout = timeout
+
+            self.session.mount('http://', self._make_adapter(pool_size, retries, timeout))
+            self.session.mount('https://', self._make_adapter(pool_size, retries, timeout, https=True))
+            # requests picks the longest matching prefix, so host mounts win over the defaults
+            for host, size in host_pools.items():
+                self.session.mount(f'http://{host}/', self._make_adapter(int(size), retries, timeout))
+                self.session.mount(f'https://{host}/', self._make_adapter(int(size), retries, timeout, https=True))
+
+    def _make_adapter(self, pool_size: int, retries: int, timeout, https: bool = False) -> HTTPAdapter:
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adapter_class, tls = (self._https_class, self._https_kwargs) if https else (_TimeoutAdapter, {})
+        return adapter_class(
+            timeout=(10, timeout),  # (connect_timeout, read_timeout)
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+            pool_block=False,
+            **tls,
+        )
+
+    def cookie_header(self, url: str) -> str:
+        """Cookie header the shared jar would send to *url*, for clients outside requests"""
+        prepared = requests.Request('GET', url).prepare()
+        return requests.cookies.get_cookie_header(self.session.cookies, prepared) or ''
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def get_session() -> requests.Session:
+    return get_client().session
+
+
+def configure(settings: Dict) -> HttpClient:
+    """Apply SettingsManager settings to the shared client"""
+    client = get_client()
+    client.configure(settings)
+    return client
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from functools import partial
+from typing import Dict
+
+MB = 1024 * 1024
+
+
+class MemoryBudget:
+    """
+    Process-wide cap on download bytes held in memory. Every stage that buffers
+    data (range workers handing chunks to the disk writer, HLS segments waiting
+    to be written in order) reserves before it reads more and releases once the
+    bytes are on disk, so concurrent downloads share one limit instead of each
+    sizing its own buffers.
+    """
+
+    def __init__(self, limit: int = 256 * MB):
+        self.limit = limit  # 0 = unlimited
+        self._cond = threading.Condition()
+        self.current = 0
+        self.peak = 0
+        # How often and how long readers were held back by the budget
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def configure(self, settings: Dict):
+        """Apply memory_budget_mb"""
+        with self._cond:
+            self.limit = max(0, int(settings.get('memory_budget_mb', 256))) * MB
+            self._cond.notify_all()
+
+    def _fits(self, nbytes: int) -> bool:
+        # A single oversized request is still granted when nothing else is held
+        return not self.limit or not self.current or self.current + nbytes <= self.limit
+
+    def _take(self, nbytes: int):
+        self.current += nbytes
+        self.peak = max(self.peak, self.current)
+
+    def try_reserve(self, nbytes: int) -> bool:
+        """Reserve *nbytes* if they fit right now; never blocks"""
+        with self._cond:
+            if not self._fits(nbytes):
+                return False
+            self._take(nbytes)
+            return True
+
+    def reserve(self, nbytes: int):
+        """Reserve *nbytes*, blocking until other holders release enough"""
+        with self._cond:
+            if not self._fits(nbytes):
+                self.waits += 1
+                started = time.monotonic()
+                while not self._fits(nbytes):
+                    self._cond.wait()
+                self.wait_time += time.monotonic() - started
+            self._take(nbytes)
+
+    async def areserve(self, nbytes: int):
+        """Event-loop friendly reserve: only waits in a thread when the budget is exhausted"""
+        if not self.try_reserve(nbytes):
+            await asyncio.get_running_loop().run_in_executor(None, partial(self.reserve, nbytes))
+
+    def release(self, nbytes: int):
+        with self._cond:
+            self.current = max(0, self.current - nbytes)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {'current': self.current, 'peak': self.peak, 'limit': self.limit,
+                    'waits': self.waits, 'wait_time': self.wait_time}
+
+
+budget = MemoryBudget()
+
+
+def configure(settings: Dict) -> MemoryBudget:
+    budget.configure(settings)
+    return budget
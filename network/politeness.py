@@ -0,0 +1,79 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class HostScheduler:
+    """
+    Per-host request pacing: request starts to one host are spaced by at least
+    *interval* seconds plus random jitter. Only callers waiting on the same host
+    are held back; requests to other hosts go out immediately.
+    """
+
+    def __init__(self, interval: float = 0.5, jitter: float = 0.5):
+        self.interval = interval
+        self.jitter = jitter
+        self.host_intervals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+        self._local = threading.local()
+
+    def configure(self, settings: Dict):
+        """Apply host_request_interval, host_request_jitter and host_request_intervals"""
+        with self._lock:
+            self.interval = float(settings.get('host_request_interval', 0.5))
+            self.jitter = float(settings.get('host_request_jitter', 0.5))
+            self.host_intervals = {host.lower(): float(value) for host, value in
+                                   (settings.get('host_request_intervals', {}) or {}).items()}
+
+    def reserve(self, url: str) -> float:
+        """Book the next request slot for the host of *url*; returns the wait until that slot"""
+        host = urlparse(url).netloc.lower()
+        interval = self.host_intervals.get(host, self.interval)
+        if interval <= 0 and self.jitter <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + interval + random.uniform(0, self.jitter)
+            return slot - now
+
+    def penalize(self, url: str, seconds: float):
+        """Push the host's next slot back, e.g. after a captcha or 429"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            self._next_slot[host] = max(self._next_slot.get(host, 0.0), time.monotonic() + seconds)
+
+    def wait(self, url: str):
+        if getattr(self._local, 'exempt', 0):
+            return
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_turn(self, url: str):
+        """Event-loop counterpart of wait(), for the asyncio engine's own requests"""
+        delay = self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @contextmanager
+    def exempt(self):
+        """Skip pacing for requests made by this thread, e.g. media segments of an already paced download"""
+        self._local.exempt = getattr(self._local, 'exempt', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.exempt -= 1
+
+
+scheduler = HostScheduler()
+
+
+def configure(settings: Dict) -> HostScheduler:
+    scheduler.configure(settings)
+    return scheduler
@@ -0,0 +1,80 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass
+class Probe:
+    """What one HEAD (or header-only GET) told us about a media URL"""
+    url: str
+    final_url: str
+    status: int = 0
+    size: int = 0
+    accept_ranges: str = ''
+    etag: str = ''
+    last_modified: str = ''
+    content_type: str = ''
+    checked_at: float = 0.0  # time.monotonic() of the request
+
+    @classmethod
+    def from_headers(cls, url: str, final_url: str, status: int, headers) -> 'Probe':
+        return cls(
+            url=url,
+            final_url=final_url or url,
+            status=status,
+            size=int(headers.get('Content-Length', 0) or 0),
+            accept_ranges=headers.get('Accept-Ranges', ''),
+            etag=headers.get('ETag', ''),
+            last_modified=headers.get('Last-Modified', ''),
+            content_type=headers.get('Content-Type', ''),
+            checked_at=time.monotonic(),
+        )
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def supports_ranges(self) -> bool:
+        # A missing header is not a "no"; many CDNs answer ranges without advertising them
+        # (a server that really ignores Range answers 200, which aborts the range download at once)
+        return self.accept_ranges.lower() != 'none'
+
+
+_cache: Dict[str, Probe] = {}
+_cache_lock = threading.Lock()
+
+
+def get_cached(url: str) -> Optional[Probe]:
+    with _cache_lock:
+        return _cache.get(url)
+
+
+def remember(probe: Probe) -> Probe:
+    if probe.ok:
+        with _cache_lock:
+            _cache[probe.url] = probe
+    return probe
+
+
+def clear_cache():
+    """Forget all probes; called when a download job finishes"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def probe_url(session, url: str, headers: Dict, timeout: int = 15, max_age: Optional[float] = None) -> Probe:
+    """
+    Probe *url* once per job: HEAD following redirects, or a header-only GET if HEAD is refused.
+    With *max_age*, a cached probe older than that many seconds is repeated instead of reused.
+    """
+    cached = get_cached(url)
+    if cached and (max_age is None or time.monotonic() - cached.checked_at <= max_age):
+        return cached
+
+    r = session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+    if r.status_code != 200:
+        with session.get(url, headers=headers, stream=True, timeout=timeout) as r:
+            pass
+    return remember(Probe.from_headers(url, r.url, r.status_code, r.headers))
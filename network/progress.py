@@ -0,0 +1,223 @@
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from rich.console import Console
+from rich.markup import escape
+from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn, TransferSpeedColumn, DownloadColumn
+
+MODES = ('auto', 'rich', 'plain', 'off')
+
+
+class Transfer:
+    """
+    Byte counter for one file. Every thread adds to its own slot, so reporting
+    progress takes no lock; the hub sums the slots when it renders.
+    """
+
+    def __init__(self, hub: 'ProgressHub', name: str, total: Optional[int] = None, completed: int = 0):
+        self.hub = hub
+        self.name = name
+        self.total = total or None
+        self.base = completed
+        self.finished = False
+        self.ok = True
+        self._slots: List[List[int]] = []
+        self._local = threading.local()
+        self._register_lock = threading.Lock()
+
+    def advance(self, nbytes: int):
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            slot = [0]
+            with self._register_lock:  # once per thread and transfer
+                self._slots.append(slot)
+            self._local.slot = slot
+        slot[0] += nbytes  # only this thread ever writes this slot
+
+    def set_total(self, total: Optional[int]):
+        self.total = total or None
+
+    @property
+    def completed(self) -> int:
+        return self.base + sum(slot[0] for slot in list(self._slots))
+
+    def close(self, ok: bool = True):
+        self.ok = ok
+        self.finished = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(exc_type is None and self.ok)
+
+
+class ProgressHub:
+    """
+    One progress display for every concurrent transfer in the process.
+    A single render thread samples the counters at a fixed rate and draws
+    per-file rows plus an aggregate row (rich), a periodic status line (plain),
+    or nothing at all (off).
+    """
+
+    REFRESH_PER_SECOND = 4
+    PLAIN_INTERVAL = 5.0
+
+    def __init__(self, mode: str = 'auto', console: Console = None):
+        self.console = console or Console()
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._transfers: List[Transfer] = []
+        self._thread: Optional[threading.Thread] = None
+        self._finished_bytes = 0
+        self._finished_total = 0
+        self._samples: List = []
+
+    def configure(self, settings: Dict):
+        mode = settings.get('progress_mode', 'auto')
+        self.mode = mode if mode in MODES else 'auto'
+
+    @property
+    def effective_mode(self) -> str:
+        if self.mode == 'auto':
+            return 'rich' if sys.stdout.isatty() else 'plain'
+        return self.mode
+
+    def transfer(self, name: str, total: Optional[int] = None, completed: int = 0) -> Transfer:
+        """Register a transfer and make sure the render thread is running"""
+        transfer = Transfer(self, name[:40], total, completed)
+        if self.effective_mode == 'off':
+            return transfer
+        with self._lock:
+            self._transfers.append(transfer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='progress-hub', daemon=True)
+                self._thread.start()
+        return transfer
+
+    def flush(self, timeout: float = 2.0):
+        """Wait for the display to draw its last frame once every transfer has finished"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _snapshot(self):
+        """Active transfers, and the finished ones to report once; finished ones leave the display"""
+        with self._lock:
+            active = [t for t in self._transfers if not t.finished]
+            done = [t for t in self._transfers if t.finished]
+            for transfer in done:
+                self._finished_bytes += transfer.completed
+                self._finished_total += transfer.total or transfer.completed
+            self._transfers = active
+            return active, done
+
+    def _totals(self, active: List[Transfer]):
+        completed = self._finished_bytes + sum(t.completed for t in active)
+        total = self._finished_total + sum(t.total or t.completed for t in active)
+        return completed, total
+
+    def _speed(self, completed: int) -> float:
+        now = time.monotonic()
+        self._samples.append((now, completed))
+        self._samples = [s for s in self._samples if now - s[0] <= 10.0]
+        first_time, first_bytes = self._samples[0]
+        return (completed - first_bytes) / (now - first_time) if now > first_time else 0.0
+
+    def _idle(self) -> bool:
+        with self._lock:
+            if self._transfers:
+                return False
+            # Reset the aggregate for the next batch
+            self._thread = None
+            self._finished_bytes = self._finished_total = 0
+            self._samples = []
+            return True
+
+    def _run(self):
+        # Each pass renders until nothing is active; a transfer added meanwhile starts another pass
+        while True:
+            if self.effective_mode == 'rich':
+                self._render_rich()
+            else:
+                self._render_plain()
+            if self._idle():
+                return
+
+    def _render_rich(self):
+        progress = Progress(
+            TextColumn("[bold blue]{task.description}"),
+            BarColumn(bar_width=None),
+            "[progress.percentage]{task.percentage:>3.1f}%",
+            "•",
+            DownloadColumn(),
+            "•",
+            TransferSpeedColumn(),
+            "•",
+            TimeRemainingColumn(),
+            console=self.console,
+            auto_refresh=False,
+            transient=False
+        )
+        tasks: Dict[int, int] = {}
+        aggregate = None
+        with progress:
+            while True:
+                active, done = self._snapshot()
+                for transfer in done:
+                    task_id = tasks.pop(id(transfer), None)
+                    if task_id is not None:
+                        progress.remove_task(task_id)
+                    mark = "[green]✓" if transfer.ok else "[red]✗"
+                    progress.console.print(f"{mark} {escape(transfer.name)}: {transfer.completed / 1024 / 1024:.1f} MB")
+                for transfer in active:
+                    if id(transfer) not in tasks:
+                        tasks[id(transfer)] = progress.add_task(escape(transfer.name), total=transfer.total,
+                                                                completed=transfer.base)
+                    progress.update(tasks[id(transfer)], total=transfer.total, completed=transfer.completed)
+
+                completed, total = self._totals(active)
+                if aggregate is None and len(active) > 1:
+                    aggregate = progress.add_task("[bold]Total", total=total, completed=completed)
+                if aggregate is not None:
+                    progress.update(aggregate, total=total, completed=completed)
+                progress.refresh()
+
+                if not active:
+                    return
+                time.sleep(1 / self.REFRESH_PER_SECOND)
+
+    def _render_plain(self):
+        next_line = time.monotonic() + self.PLAIN_INTERVAL
+        while True:
+            active, done = self._snapshot()
+            for transfer in done:
+                status = "done" if transfer.ok else "failed"
+                print(f"[*] {transfer.name}: {status}, {transfer.completed / 1024 / 1024:.1f} MB")
+
+            completed, total = self._totals(active)
+            speed = self._speed(completed)
+            if active and time.monotonic() >= next_line:
+                next_line = time.monotonic() + self.PLAIN_INTERVAL
+                eta = f"{(total - completed) / speed:.0f}s" if speed > 0 and total > completed else "?"
+                print(f"[*] {len(active)} active, {completed / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f} MB, "
+                      f"{speed / 1024 / 1024:.2f} MB/s, ETA {eta}")
+
+            if not active:
+                return
+            time.sleep(1 / self.REFRESH_PER_SECOND)
+
+
+hub = ProgressHub()
+
+
+def configure(settings: Dict) -> ProgressHub:
+    hub.configure(settings)
+    return hub
+
+
+def transfer(name: str, total: Optional[int] = None, completed: int = 0) -> Transfer:
+    return hub.transfer(name, total, completed)
@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+
+class RangesNotSupported(Exception):
+    """The server answered a Range request with the whole file; retrying won't change that"""
+
+
+class RangeClaim:
+    """A byte range currently owned by one worker; *end* may shrink when it gets split"""
+
+    def __init__(self, claim_id: int, start: int, end: int, attempts: int = 0):
+        self.id = claim_id
+        self.start = start
+        self.pos = start
+        self.end = end
+        self.attempts = attempts
+
+    @property
+    def remaining(self) -> int:
+        return self.end - self.pos + 1
+
+    @property
+    def done(self) -> bool:
+        return self.pos > self.end
+
+
+class RangeScheduler:
+    """Work-stealing scheduler handing out small byte ranges to parallel workers.
+
+    Workers pull pieces from a shared queue. Once the queue is empty an idle
+    worker steals the second half of the largest range still in flight, so a
+    slow connection only holds on to a shrinking tail. Failed ranges go back
+    into the queue with exponential backoff instead of failing the file.
+    Pieces and split points fall on multiples of *align*, so per-block
+    hashing never sees a block shared by two workers.
+    """
+
+    def __init__(self, ranges: List[Tuple[int, int]], piece_size: int = 8 * 1024 * 1024,
+                 min_split: int = 1024 * 1024, max_attempts: int = 5, backoff: float = 1.0,
+                 align: int = 1):
+        self.min_split = min_split
+        self.align = max(1, align)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.failed = False
+        self.last_error = None
+        self._cond = threading.Condition()
+        self._pending = deque()  # (start, end, attempts, not_before)
+        self._active = {}
+        self._next_id = 0
+
+        for start, end in ranges:
+            while start <= end:
+                # Cut on the absolute piece grid, so resumed gaps stay aligned too
+                piece_end = min(end, (start // piece_size + 1) * piece_size - 1)
+                self._pending.append((start, piece_end, 0, 0.0))
+                start = piece_end + 1
+
+    def next_range(self) -> Optional[RangeClaim]:
+        """Block until a range is available; None once everything is done or the file failed"""
+        with self._cond:
+            while True:
+                claim, finished, wait_for = self._poll()
+                if claim or finished:
+                    return claim
+                self._cond.wait(timeout=wait_for)
+
+    def poll(self):
+        """Non-blocking next_range for event-loop callers.
+
+        Returns (claim, finished, wait_for): a claim to work on, or finished=True
+        once there is nothing left, or the number of seconds worth waiting
+        (None meaning "until another range completes").
+        """
+        with self._cond:
+            return self._poll()
+
+    def _poll(self):
+        if self.failed:
+            return None, True, None
+
+        now = time.monotonic()
+        wait_for = None
+        for i, (start, end, attempts, not_before) in enumerate(self._pending):
+            if not_before <= now:
+                del self._pending[i]
+                return self._claim(start, end, attempts), False, None
+            delay = not_before - now
+            wait_for = delay if wait_for is None else min(wait_for, delay)
+
+        stolen = self._steal()
+        if stolen:
+            return stolen, False, None
+        if not self._active and not self._pending:
+            return None, True, None
+        return None, False, wait_for
+
+    def clip(self, claim: RangeClaim, nbytes: int) -> int:
+        """How many of *nbytes* the worker may still write for *claim*"""
+        with self._cond:
+            return max(0, min(nbytes, claim.remaining))
+
+    def advance(self, claim: RangeClaim, nbytes: int):
+        with self._cond:
+            claim.pos += nbytes
+
+    def complete(self, claim: RangeClaim):
+        with self._cond:
+            self._active.pop(claim.id, None)
+            self._cond.notify_all()
+
+    def fail(self, claim: RangeClaim, error: Exception = None):
+        """Put the unfinished part of *claim* back into the queue after a backoff"""
+        with self._cond:
+            self._active.pop(claim.id, None)
+            self.last_error = error
+            if not claim.done:
+                # Only attempts that made no progress count towards giving up
+                attempts = claim.attempts + 1 if claim.pos == claim.start else 1
+                if attempts >= self.max_attempts:
+                    self.failed = True
+                else:
+                    delay = self.backoff * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                    self._pending.append((claim.pos, claim.end, attempts, time.monotonic() + delay))
+            self._cond.notify_all()
+
+    def abort(self, claim: RangeClaim, error: Exception):
+        """Fail the whole file at once, e.g. when the server ignores Range"""
+        with self._cond:
+            self._active.pop(claim.id, None)
+            self.last_error = error
+            self.failed = True
+            self._cond.notify_all()
+
+    def _claim(self, start: int, end: int, attempts: int) -> RangeClaim:
+        claim = RangeClaim(self._next_id, start, end, attempts)
+        self._next_id += 1
+        self._active[claim.id] = claim
+        return claim
+
+    def _steal(self) -> Optional[RangeClaim]:
+        """Split the largest in-flight range and hand its upper half to the caller"""
+        if not self._active:
+            return None
+        victim = max(self._active.values(), key=lambda c: c.remaining)
+        if victim.remaining < 2 * self.min_split:
+            return None
+        mid = victim.pos + victim.remaining // 2
+        mid -= mid % self.align
+        if mid <= victim.pos:
+            return None
+        old_end = victim.end
+        victim.end = mid - 1
+        return self._claim(mid, old_end, 0)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Token bucket in bytes per second; rate 0 means unlimited"""
+
+    def __init__(self, rate: float = 0, burst: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.burst = 0.0
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: float, burst: Optional[float] = None):
+        with self._lock:
+            self.rate = float(rate)
+            self.burst = float(burst or rate)  # one second worth of traffic by default
+            self._tokens = min(self._tokens, self.burst)
+            self._stamp = time.monotonic()
+
+    def reserve(self, amount: int) -> float:
+        """Take *amount* tokens now and return how long the caller must wait before using them"""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            # The balance may go negative; the debt is paid off by the caller's sleep
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+class BandwidthLimiter:
+    """
+    Process-wide bandwidth limit shared by every transfer path.
+    A global bucket caps the total, optional per-host buckets cap single CDNs,
+    and the global rate follows a day/night schedule.
+    """
+
+    SCHEDULE_CHECK_INTERVAL = 30.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.global_bucket = TokenBucket()
+        self.default_limit = 0
+        self.schedule: List[Dict] = []
+        self.host_limits: Dict[str, int] = {}
+        self._host_buckets: Dict[str, TokenBucket] = {}
+        self._next_check = 0.0
+
+    def configure(self, settings: Dict):
+        """Apply bandwidth_limit, bandwidth_schedule and bandwidth_host_limits (all in KB/s)"""
+        with self._lock:
+            self.default_limit = int(settings.get('bandwidth_limit', 0) or 0) * 1024
+            self.schedule = list(settings.get('bandwidth_schedule', []) or [])
+            self.host_limits = {host.lower(): int(limit) * 1024
+                                for host, limit in (settings.get('bandwidth_host_limits', {}) or {}).items()}
+            self._host_buckets = {host: TokenBucket(limit) for host, limit in self.host_limits.items() if limit > 0}
+            self._next_check = 0.0
+        self._refresh_schedule()
+
+    def scheduled_limit(self, now: Optional[time.struct_time] = None) -> int:
+        """Global limit in bytes/s for the current time of day"""
+        now = now or time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for window in self.schedule:
+            try:
+                start, end = _minutes(window['from']), _minutes(window['to'])
+            except (KeyError, ValueError):
+                continue
+            # Windows may wrap midnight, e.g. 22:00 -> 07:00
+            inside = start <= minute < end if start <= end else minute >= start or minute < end
+            if inside:
+                return int(window.get('limit', 0) or 0) * 1024
+        return self.default_limit
+
+    def _refresh_schedule(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.SCHEDULE_CHECK_INTERVAL
+        limit = self.scheduled_limit()
+        if limit != self.global_bucket.rate:
+            self.global_bucket.set_rate(limit)
+
+    def _host_bucket(self, url: str) -> Optional[TokenBucket]:
+        if not self._host_buckets:
+            return None
+        return self._host_buckets.get(urlparse(url).netloc.lower())
+
+    def reserve(self, url: str, amount: int) -> float:
+        """Delay before *amount* bytes from *url* may be consumed"""
+        self._refresh_schedule()
+        delay = self.global_bucket.reserve(amount)
+        host_bucket = self._host_bucket(url)
+        if host_bucket:
+            delay = max(delay, host_bucket.reserve(amount))
+        return delay
+
+    def throttle(self, url: str, amount: int):
+        """Blocking form for the thread-based downloaders"""
+        delay = self.reserve(url, amount)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def athrottle(self, url: str, amount: int):
+        """Awaitable form for the asyncio engine"""
+        delay = self.reserve(url, amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+limiter = BandwidthLimiter()
+
+
+def configure(settings: Dict) -> BandwidthLimiter:
+    limiter.configure(settings)
+    return limiter
@@ -0,0 +1,151 @@
+import calendar
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Next to where SeriesDL was started
+CACHE_FILE = os.path.abspath('resolve_cache.json')
+
+# Query parameters CDNs commonly use for the absolute expiry (epoch seconds) of a signed URL
+_EXPIRY_PARAMS = ('expires', 'expire', 'expiry', 'exp', 'e', 'validto', 'valid_to', 'deadline')
+_SAFETY_MARGIN = 60  # seconds; don't hand out links about to expire mid-download
+
+# Probe statuses meaning a cached media URL was revoked and the host page must be resolved again
+MEDIA_GONE_STATUSES = (403, 410)
+
+
+def signed_url_expiry(url: str) -> Optional[float]:
+    """Absolute expiry time encoded in a signed media URL, if any"""
+    query = {k.lower(): v for k, v in parse_qs(urlparse(url).query).items()}
+
+    for param in _EXPIRY_PARAMS:
+        for value in query.get(param, []):
+            if value.isdigit():
+                ts = int(value)
+                if ts > 10 ** 12:  # milliseconds
+                    ts //= 1000
+                if ts > time.time() - 365 * 86400:
+                    return float(ts)
+
+    # AWS-style: X-Amz-Date=20240101T000000Z&X-Amz-Expires=3600
+    if 'x-amz-date' in query and 'x-amz-expires' in query:
+        try:
+            signed_at = calendar.timegm(time.strptime(query['x-amz-date'][0], '%Y%m%dT%H%M%SZ'))
+            return signed_at + int(query['x-amz-expires'][0])
+        except (ValueError, OverflowError):
+            return None
+    return None
+
+
+class ResolutionCache:
+    """Persistent cache of host page URL -> resolved media source"""
+
+    def __init__(self, path: str = CACHE_FILE, ttl: int = 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, host_url: str) -> Optional[Dict]:
+        """Cached source for *host_url*, or None if missing or expired"""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(host_url)
+            if not entry:
+                return None
+            if entry['expires'] <= time.time():
+                del self._entries[host_url]
+                self._save()
+                return None
+            return dict(entry['source'])
+
+    def put(self, host_url: str, source: Dict):
+        """Remember *source*; it expires with its signed URL or after the TTL, whichever is first"""
+        if self.ttl <= 0:
+            return
+        expires = time.time() + self.ttl
+        signed_expiry = signed_url_expiry(source['url'])
+        if signed_expiry:
+            expires = min(expires, signed_expiry - _SAFETY_MARGIN)
+        if expires <= time.time():
+            return
+        with self._lock:
+            now = time.time()
+            self._entries = {k: v for k, v in self._entries.items() if v['expires'] > now}
+            self._entries[host_url] = {'source': source, 'expires': expires}
+            self._save()
+
+    def invalidate(self, host_url: str):
+        with self._lock:
+            if self._entries.pop(host_url, None) is not None:
+                self._save()
+
+
+class HopCache:
+    """In-memory memo of redirect/iframe hops, so episodes sharing a redirector fetch it once"""
+
+    def __init__(self, ttl: int = 600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hops: Dict[str, Tuple[str, float]] = {}
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            hop = self._hops.get(url)
+            if hop and hop[1] > time.time():
+                return hop[0]
+            self._hops.pop(url, None)
+            return None
+
+    def put(self, url: str, target: str):
+        with self._lock:
+            self._hops[url] = (target, time.time() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._hops.clear()
+
+
+hop_cache = HopCache()
+
+_cache: Optional[ResolutionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_resolution_cache() -> ResolutionCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResolutionCache()
+        return _cache
+
+
+def configure(settings: Dict) -> ResolutionCache:
+    """Apply the resolve_cache_ttl setting"""
+    cache = get_resolution_cache()
+    cache.ttl = int(settings.get('resolve_cache_ttl', 3600))
+    return cache
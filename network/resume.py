@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class DownloadState:
+    """Sidecar range map that lets an interrupted download pick up where it stopped"""
+
+    SUFFIX = '.json'
+    SAVE_INTERVAL = 2.0  # seconds between periodic saves
+
+    def __init__(self, part_path: str, url: str, total_size: int,
+                 etag: str = '', last_modified: str = '', completed: Optional[List] = None):
+        self.part_path = part_path
+        self.path = part_path + self.SUFFIX
+        self.url = url
+        self.total_size = total_size
+        self.etag = etag or ''
+        self.last_modified = last_modified or ''
+        self.completed: List[Tuple[int, int]] = [tuple(r) for r in (completed or [])]
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    @classmethod
+    def load(cls, part_path: str) -> Optional['DownloadState']:
+        """Read the sidecar for *part_path*, or None if there is no usable one"""
+        path = part_path + cls.SUFFIX
+        if not os.path.exists(path) or not os.path.exists(part_path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            state = cls(part_path, data['url'], int(data['total_size']),
+                        data.get('etag', ''), data.get('last_modified', ''),
+                        data.get('completed', []))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if os.path.getsize(part_path) != state.total_size:
+            return None
+        return state
+
+    def matches(self, url: str, total_size: int, etag: str = '', last_modified: str = '') -> bool:
+        """True if the server object is still the one this state was recorded for"""
+        if total_size != self.total_size:
+            return False
+        if self.etag and etag and self.etag != etag:
+            return False
+        if self.last_modified and last_modified and self.last_modified != last_modified:
+            return False
+        if not (self.etag and etag) and not (self.last_modified and last_modified):
+            # No validator to compare; signed query strings change, so compare the object path
+            old, new = urlparse(self.url), urlparse(url)
+            return (old.netloc, old.path) == (new.netloc, new.path)
+        return True
+
+    def mark_done(self, start: int, end: int):
+        """Record bytes start..end (inclusive) as written"""
+        with self._lock:
+            merged = []
+            for s, e in sorted(self.completed + [(start, end)]):
+                if merged and s <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+                else:
+                    merged.append((s, e))
+            self.completed = merged
+
+    def completed_bytes(self) -> int:
+        with self._lock:
+            return sum(e - s + 1 for s, e in self.completed)
+
+    def contiguous_prefix(self) -> int:
+        """Number of bytes already written from the start of the file"""
+        with self._lock:
+            if self.completed and self.completed[0][0] == 0:
+                return self.completed[0][1] + 1
+            return 0
+
+    def missing_ranges(self) -> List[Tuple[int, int]]:
+        """Inclusive byte ranges that still have to be fetched"""
+        with self._lock:
+            missing = []
+            pos = 0
+            for s, e in self.completed:
+                if s > pos:
+                    missing.append((pos, s - 1))
+                pos = max(pos, e + 1)
+            if pos < self.total_size:
+                missing.append((pos, self.total_size - 1))
+            return missing
+
+    def save(self, force: bool = True):
+        """Atomically write the sidecar; with force=False only every SAVE_INTERVAL seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_save < self.SAVE_INTERVAL:
+                return
+            self._last_save = now
+            data = {
+                'url': self.url,
+                'total_size': self.total_size,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'completed': self.completed,
+            }
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @classmethod
+    def discard(cls, part_path: str):
+        """Remove the sidecar of *part_path*, whether or not it could be loaded"""
+        path = part_path + cls.SUFFIX
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+BLOCK_SIZE = 1024 * 1024
+MANIFEST_NAME = '.seriesdl-manifest.json'
+
+_HTML_PREFIXES = (b'<!doctype', b'<html', b'<?xml', b'<head', b'<body', b'<!--')
+_MP4_FIRST_BOXES = (b'ftyp', b'styp', b'moov', b'free', b'skip', b'wide', b'pdin')
+
+
+class _BlockStream:
+    """Sequential writer's view of a PieceHasher; blocks it saw from their first byte get hashed"""
+
+    def __init__(self, hasher: 'PieceHasher', offset: int):
+        self.hasher = hasher
+        self.pos = offset
+        # A stream starting mid-block can't hash that block; it's read back at finalize
+        self._sha = hashlib.sha1() if offset % hasher.block_size == 0 else None
+
+    def update(self, data: bytes):
+        block_size = self.hasher.block_size
+        view = memoryview(data)
+        while view:
+            block_end = (self.pos // block_size + 1) * block_size
+            take = min(len(view), block_end - self.pos)
+            if self._sha is not None:
+                self._sha.update(view[:take])
+            self.pos += take
+            view = view[take:]
+            if self.pos == block_end or self.pos == self.hasher.total_size:
+                if self._sha is not None:
+                    self.hasher.add((self.pos - 1) // block_size, self._sha.digest())
+                self._sha = hashlib.sha1()
+
+
+class PieceHasher:
+    """
+    SHA-1 per fixed-size block, fed by any number of writers at their own offsets.
+    The file digest is the SHA-1 of all block digests in order, so it does not
+    depend on the order in which parallel ranges arrived.
+    """
+
+    def __init__(self, total_size: int = 0, block_size: int = BLOCK_SIZE):
+        self.total_size = total_size
+        self.block_size = block_size
+        self._digests: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+
+    def stream(self, offset: int = 0) -> _BlockStream:
+        return _BlockStream(self, offset)
+
+    def add(self, index: int, digest: bytes):
+        with self._lock:
+            self._digests[index] = digest
+
+    def digest(self, path: str):
+        """File digest of *path*; returns (hexdigest, blocks_read_back)"""
+        size = os.path.getsize(path)
+        blocks = (size + self.block_size - 1) // self.block_size
+        if self.total_size != size:
+            # Trailing blocks hashed against another size can't be trusted
+            self._digests = {i: d for i, d in self._digests.items() if (i + 1) * self.block_size <= size}
+        read_back = 0
+        with open(path, 'rb') as f:
+            for index in range(blocks):
+                if index not in self._digests:
+                    f.seek(index * self.block_size)
+                    self._digests[index] = hashlib.sha1(f.read(self.block_size)).digest()
+                    read_back += 1
+        root = hashlib.sha1(b''.join(self._digests[i] for i in range(blocks)))
+        return root.hexdigest(), read_back
+
+
+@dataclass
+class VerifyResult:
+    ok: bool
+    size: int = 0
+    container: str = ''
+    digest: str = ''
+    reason: str = ''
+
+
+def _walk_mp4(f, size: int) -> str:
+    """Walk the top-level boxes; returns a problem description or ''"""
+    offset = 0
+    seen = set()
+    while offset < size:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return f"truncated box header at byte {offset}"
+        box_size, box_type = struct.unpack('>I4s', header[:8])
+        if box_size == 1:
+            if len(header) < 16:
+                return f"truncated box header at byte {offset}"
+            box_size = struct.unpack('>Q', header[8:16])[0]
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < 8:
+            return f"invalid box size at byte {offset}"
+        if offset + box_size > size:
+            return f"'{box_type.decode('latin-1')}' box runs past the end of the file (truncated)"
+        seen.add(box_type)
+        offset += box_size
+    if b'moov' not in seen:
+        return "no 'moov' box (incomplete MP4)"
+    return ''
+
+
+def sniff_container(path: str, size: int):
+    """Identify the container from its header; returns (container, problem)"""
+    with open(path, 'rb') as f:
+        head = f.read(512)
+        if not head:
+            return '', "file is empty"
+        if head.lstrip()[:16].lower().startswith(_HTML_PREFIXES):
+            return 'html', "server sent an HTML page instead of video"
+        if head[4:8] in _MP4_FIRST_BOXES:
+            return 'mp4', _walk_mp4(f, size)
+    if head[0] == 0x47 and (len(head) <= 188 or head[188] == 0x47):
+        return 'ts', ''
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'mkv', ''
+    return 'unknown', ''
+
+
+def verify_file(path: str, expected_size: int = 0, hasher: Optional[PieceHasher] = None) -> VerifyResult:
+    """Check size, container structure and digest of *path*; blocks already hashed are not read again"""
+    if not os.path.exists(path):
+        return VerifyResult(False, reason="file is missing")
+    size = os.path.getsize(path)
+    if expected_size and size != expected_size:
+        return VerifyResult(False, size, reason=f"size {size} does not match Content-Length {expected_size}")
+
+    container, problem = sniff_container(path, size)
+    if problem:
+        return VerifyResult(False, size, container, reason=problem)
+
+    digest, _ = (hasher or PieceHasher(size)).digest(path)
+    return VerifyResult(True, size, container, digest)
+
+
+_manifest_lock = threading.Lock()
+
+
+def _manifest_path(path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(path)), MANIFEST_NAME)
+
+
+def _load_manifest(manifest_path: str) -> Dict:
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_manifest(directory: str) -> Dict:
+    """Every verified entry recorded for *directory*, keyed by file name"""
+    with _manifest_lock:
+        return _load_manifest(os.path.join(os.path.abspath(directory), MANIFEST_NAME))
+
+
+def record(path: str, result: VerifyResult):
+    """Store a verified file's result in its directory's manifest, keyed by name, size and mtime"""
+    manifest_path = _manifest_path(path)
+    stat = os.stat(path)
+    entry = dict(asdict(result), mtime=stat.st_mtime, verified_at=time.time())
+    with _manifest_lock:
+        manifest = _load_manifest(manifest_path)
+        manifest[os.path.basename(path)] = entry
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+
+def check(path: str) -> VerifyResult:
+    """Verify *path*, trusting the manifest while size and mtime are unchanged"""
+    if not os.path.exists(path):
+        return VerifyResult(False, reason="file is missing")
+    stat = os.stat(path)
+    with _manifest_lock:
+        entry = _load_manifest(_manifest_path(path)).get(os.path.basename(path))
+    if entry and entry.get('ok') and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime:
+        return VerifyResult(True, entry['size'], entry.get('container', ''), entry.get('digest', ''))
+
+    result = verify_file(path)
+    if result.ok:
+        record(path, result)
+    return result
+
+
+def finalize_download(part_path: str, filename: str, expected_size: int = 0,
+                      hasher: Optional[PieceHasher] = None, log=print) -> bool:
+    """Verify a finished .part file, then move it into place and record it; a bad file is discarded"""
+    result = verify_file(part_path, expected_size, hasher)
+    if not result.ok:
+        log(f"[!] Verification failed for {os.path.basename(filename)}: {result.reason}")
+        os.remove(part_path)
+        return False
+    os.replace(part_path, filename)
+    record(filename, result)
+    return True
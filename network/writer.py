@@ -0,0 +1,205 @@
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from functools import partial
+from typing import Callable, Dict, Optional
+
+from network.membudget import budget
+
+COALESCE_LIMIT = 8 * 1024 * 1024
+
+
+class _WriteItem:
+    __slots__ = ('handle', 'offset', 'data', 'on_written')
+
+    def __init__(self, handle, offset, data, on_written):
+        self.handle = handle
+        self.offset = offset
+        self.data = data
+        self.on_written = on_written
+
+
+class WriteHandle:
+    """One open output file fed through the DiskWriter; only the writer thread touches the file"""
+
+    def __init__(self, writer: 'DiskWriter', path: str, f):
+        self.writer = writer
+        self.path = path
+        self._file = f
+        self._pending = 0
+        self._cond = threading.Condition()
+        self.error: Optional[BaseException] = None
+
+    def write(self, offset: int, data: bytes, on_written: Callable[[int, int], None] = None):
+        """Queue *data* for *offset*; blocks while the memory budget or the writer queue is full"""
+        self._enqueue(offset, data, on_written, block=True)
+
+    def try_write(self, offset: int, data: bytes, on_written: Callable[[int, int], None] = None) -> bool:
+        """Non-blocking write; False if the memory budget or the queue is full"""
+        return self._enqueue(offset, data, on_written, block=False)
+
+    async def awrite(self, offset: int, data: bytes, on_written: Callable[[int, int], None] = None):
+        """Event-loop friendly write: only waits in a thread when the budget or the queue is full"""
+        if not self.try_write(offset, data, on_written):
+            await asyncio.get_running_loop().run_in_executor(None, partial(self.write, offset, data, on_written))
+
+    def _enqueue(self, offset, data, on_written, block) -> bool:
+        if self.error:
+            raise self.error
+        # The buffer counts against the process-wide budget until the writer has stored it;
+        # a reader blocked here doesn't pull more from its socket
+        if block:
+            budget.reserve(len(data))
+        elif not budget.try_reserve(len(data)):
+            return False
+        with self._cond:
+            self._pending += 1
+        if self.writer.put(_WriteItem(self, offset, data, on_written), block):
+            return True
+        budget.release(len(data))
+        self._finished(1)
+        return False
+
+    def _finished(self, count: int, error: BaseException = None):
+        with self._cond:
+            self._pending -= count
+            if error and not self.error:
+                self.error = error
+            self._cond.notify_all()
+
+    def close(self, fsync: bool = True):
+        """Wait for every queued write, fsync once, and close; re-raises a write error"""
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+        try:
+            if not self.error and fsync:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+        if self.error:
+            raise self.error
+
+
+class DiskWriter:
+    """
+    Disk stage between the network workers and the file system.
+    Workers hand over (file, offset, buffer) and go back to reading their socket;
+    one writer thread drains the queue, merges adjacent buffers into single writes,
+    and runs the completion callbacks. The queue is bounded in bytes, so a slow disk
+    pushes back on the network side instead of growing memory.
+    """
+
+    def __init__(self, max_queued: int = 64 * 1024 * 1024, preallocate: bool = True):
+        self.max_queued = max_queued
+        self.preallocate = preallocate
+        self._cond = threading.Condition()
+        self._items = deque()
+        self._queued = 0
+        self._thread = None
+        # Backpressure is visible: how often and how long producers waited for the disk
+        self.stalls = 0
+        self.stall_time = 0.0
+
+    def configure(self, settings: Dict):
+        """Apply write_queue_mb and preallocate_files"""
+        self.max_queued = max(1, int(settings.get('write_queue_mb', 64))) * 1024 * 1024
+        self.preallocate = bool(settings.get('preallocate_files', True))
+
+    def open(self, path: str, size: int = 0, create: bool = False) -> WriteHandle:
+        """Open *path* for positional writes; *create* truncates it and reserves *size* bytes"""
+        if create:
+            f = open(path, 'wb', buffering=0)
+            f.truncate(size)
+            if size and self.preallocate and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                except OSError:
+                    pass  # not supported by every file system; the sparse file still works
+        else:
+            f = open(path, 'r+b', buffering=0)
+        return WriteHandle(self, path, f)
+
+    def put(self, item: _WriteItem, block: bool = True) -> bool:
+        size = len(item.data)
+        with self._cond:
+            # A single oversized buffer is still accepted into an empty queue
+            if self._queued and self._queued + size > self.max_queued:
+                if not block:
+                    return False
+                self.stalls += 1
+                started = time.monotonic()
+                while self._queued and self._queued + size > self.max_queued:
+                    self._cond.wait()
+                self.stall_time += time.monotonic() - started
+            self._items.append(item)
+            self._queued += size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='disk-writer', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items:
+                    self._cond.wait()
+                batch = list(self._items)
+                self._items.clear()
+
+            by_handle = defaultdict(list)
+            for item in batch:
+                by_handle[item.handle].append(item)
+            for handle, items in by_handle.items():
+                self._write_items(handle, items)
+
+            written = sum(len(item.data) for item in batch)
+            with self._cond:
+                self._queued -= written
+                self._cond.notify_all()
+            budget.release(written)
+
+    @staticmethod
+    def _write_items(handle: WriteHandle, items):
+        items.sort(key=lambda item: item.offset)
+        error = None
+        run = []
+        run_end = None
+        run_size = 0
+
+        def flush():
+            handle._file.seek(run[0].offset)
+            view = memoryview(b''.join(item.data for item in run) if len(run) > 1 else run[0].data)
+            while view:  # unbuffered writes may be short
+                view = view[handle._file.write(view):]
+            for item in run:
+                if item.on_written:
+                    item.on_written(item.offset, len(item.data))
+
+        try:
+            if handle.error:
+                raise handle.error
+            for item in items:
+                if run and (item.offset != run_end or run_size + len(item.data) > COALESCE_LIMIT):
+                    flush()
+                    run, run_size = [], 0
+                run.append(item)
+                run_end = item.offset + len(item.data)
+                run_size += len(item.data)
+            if run:
+                flush()
+        except Exception as e:
+            error = e
+        handle._finished(len(items), error)
+
+
+disk_writer = DiskWriter()
+
+
+def configure(settings: Dict) -> DiskWriter:
+    disk_writer.configure(settings)
+    return disk_writer
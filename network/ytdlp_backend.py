@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import Dict, Optional
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils.networking import HTTPHeaderDict, std_headers
+
+from network.http_client import get_session
+from network.progress import hub as progress_hub
+from network.ratelimit import limiter
+
+
+class YtdlpBackend:
+    """
+    Long-lived YoutubeDL instance for one worker thread. Building YoutubeDL loads
+    its extractors and HTTP handlers, so each worker builds one and reuses it,
+    swapping only the per-download options. Cookies are shared with our session
+    and progress goes to the shared progress hub.
+    """
+
+    def __init__(self, concurrent_fragments: int = 8, retries: int = 3):
+        self.concurrent_fragments = concurrent_fragments
+        self.retries = retries
+        self._ydl: Optional[YoutubeDL] = None
+        self._lock = threading.Lock()
+        self._transfer = None
+        self._reported = 0
+        self._name = ''
+        self._link = ''
+
+    def _build(self) -> YoutubeDL:
+        return YoutubeDL({
+            'quiet': True,
+            'noprogress': True,  # the progress hub draws the bar
+            'no_warnings': False,
+            'noplaylist': True,
+            'concurrent_fragment_downloads': self.concurrent_fragments,
+            'retries': self.retries,
+            'fragment_retries': self.retries,
+            'progress_hooks': [self._hook],
+        })
+
+    def _hook(self, d: Dict):
+        # Called from yt-dlp's fragment threads as well; downloaded_bytes is cumulative
+        status = d.get('status')
+        with self._lock:
+            if self._transfer is None:
+                self._transfer = progress_hub.transfer(self._name)
+            transfer = self._transfer
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if total:
+                transfer.set_total(int(total))
+            done = d.get('downloaded_bytes') or 0
+            delta = done - self._reported
+            if delta > 0:
+                self._reported = done
+        if delta > 0:
+            transfer.advance(delta)
+            # Blocking yt-dlp's download thread here draws its bytes from the shared buckets,
+            # so concurrent yt-dlp and native transfers split one cap instead of each getting it
+            limiter.throttle(self._link, delta)
+        if status in ('finished', 'error'):
+            transfer.close(status == 'finished')
+
+    def _sync_cookies(self, jar_from, jar_to):
+        for cookie in list(jar_from):
+            jar_to.set_cookie(cookie)
+
+    def download(self, link: str, filename: str, headers: Dict) -> bool:
+        """Download *link* to *filename*; True on success"""
+        if self._ydl is None:
+            self._ydl = self._build()
+        ydl = self._ydl
+        session = get_session()
+
+        headers = dict(headers or {})
+        headers.pop('Cookie', None)  # cookies travel through the shared jar
+        ydl.params['http_headers'] = HTTPHeaderDict(std_headers, headers)
+        ydl.params['outtmpl']['default'] = filename
+        self._sync_cookies(session.cookies, ydl.cookiejar)
+
+        self._name = os.path.basename(filename)[:40]
+        self._link = link
+        self._transfer = None
+        self._reported = 0
+        try:
+            ydl.download([link])
+            return os.path.exists(filename)
+        except Exception as e:
+            print(f"[!] YoutubeDL error: {e}")
+            return False
+        finally:
+            if self._transfer is not None and not self._transfer.finished:
+                self._transfer.close(False)
+            self._sync_cookies(ydl.cookiejar, session.cookies)
+
+
+_settings = {'concurrent_fragments': 8, 'retries': 3}
+_local = threading.local()
+
+
+def configure(settings: Dict):
+    """Apply ytdlp_concurrent_fragments and retry_attempts; workers rebuild their backend on next use"""
+    _settings['concurrent_fragments'] = max(1, int(settings.get('ytdlp_concurrent_fragments', 8)))
+    _settings['retries'] = max(0, int(settings.get('retry_attempts', 3)))
+
+
+def get_backend() -> YtdlpBackend:
+    """This worker thread's backend"""
+    backend = getattr(_local, 'backend', None)
+    if (backend is None or backend.concurrent_fragments != _settings['concurrent_fragments']
+            or backend.retries != _settings['retries']):
+        backend = _local.backend = YtdlpBackend(**_settings)
+    return backend
+
+
+def download(link: str, filename: str, headers: Dict) -> bool:
+    return get_backend().download(link, filename, headers)
@@ -1,6 +1,6 @@
 import json
 import os
-from rich.prompt import Prompt, IntPrompt, Confirm
+from rich.prompt import Prompt, IntPrompt, FloatPrompt, Confirm
 
 class SettingsManager:
     def __init__(self, filename='settings.json', console=None):
@@ -10,11 +10,30 @@ class SettingsManager:
             "download_folder": "downloads",
             "default_language": "German",
             "default_host": "",
+            "host_racing": False,
+            "race_top_k": 3,
             "clear_console": True,
             "timeout": 30,
             "max_concurrent_downloads": 3,
+            "resolve_lookahead": 2,
+            "existing_files": "ask",
+            "preflight_workers": 8,
             "retry_attempts": 3,
-            "delay_between_downloads": 0.5
+            "host_request_interval": 0.5,
+            "host_request_jitter": 0.5,
+            "host_request_intervals": {},
+            "download_engine": "threads",
+            "ytdlp_concurrent_fragments": 8,
+            "progress_mode": "auto",
+            "write_queue_mb": 64,
+            "preallocate_files": True,
+            "memory_budget_mb": 256,
+            "http_pool_size": 20,
+            "http_host_pools": {},
+            "resolve_cache_ttl": 3600,
+            "bandwidth_limit": 0,
+            "bandwidth_schedule": [],
+            "bandwidth_host_limits": {}
         }
         self.load()
 
@@ -52,11 +71,30 @@ class SettingsManager:
             "download_folder": "Where downloaded files are saved",
             "default_language": "Default language selection",
             "default_host": "Preferred streaming host",
+            "host_racing": "Race the top hosts and use the fastest one",
+            "race_top_k": "Number of hosts to race",
             "clear_console": "Clear console between operations",
             "timeout": "Request timeout in seconds",
             "max_concurrent_downloads": "Maximum simultaneous downloads",
+            "resolve_lookahead": "Episodes resolved ahead of the running downloads",
+            "existing_files": "Items already downloaded: ask, skip, overwrite or resume",
+            "preflight_workers": "Items resolved and probed at once before downloading (0 = skip the pre-flight)",
             "retry_attempts": "Number of retry attempts on failure",
-            "delay_between_downloads": "Delay between downloads (seconds)"
+            "host_request_interval": "Minimum seconds between requests to one host",
+            "host_request_jitter": "Random extra delay per request (seconds)",
+            "host_request_intervals": "Per-host request intervals (edit settings.json)",
+            "download_engine": "Transfer engine: threads or asyncio (needs aiohttp)",
+            "ytdlp_concurrent_fragments": "Parallel fragment downloads in the YoutubeDL fallback",
+            "progress_mode": "Progress display: auto, rich, plain or off",
+            "write_queue_mb": "Received data waiting for the disk before downloads pause (MB)",
+            "preallocate_files": "Reserve disk space for the whole file up front",
+            "memory_budget_mb": "Download data held in memory across all transfers (MB, 0 = unlimited)",
+            "http_pool_size": "Keep-alive connections per host",
+            "http_host_pools": "Per-host connection pool sizes (edit settings.json)",
+            "resolve_cache_ttl": "Reuse resolved media URLs for this many seconds (0 = off)",
+            "bandwidth_limit": "Total download speed limit in KB/s (0 = unlimited)",
+            "bandwidth_schedule": "Time-of-day speed limits (edit settings.json)",
+            "bandwidth_host_limits": "Per-host speed limits in KB/s (edit settings.json)"
         }
         
         for key, val in self.settings.items():
@@ -71,10 +109,14 @@ class SettingsManager:
             return
         
         for key, val in self.settings.items():
+            if isinstance(val, (dict, list)):
+                continue  # structured values are edited in settings.json
             if isinstance(val, bool):
                 new_val = Confirm.ask(f"[cyan]{key}[/cyan] [{val}]", default=val)
             elif isinstance(val, int):
                 new_val = IntPrompt.ask(f"[cyan]{key}[/cyan] [{val}]", default=val)
+            elif isinstance(val, float):
+                new_val = FloatPrompt.ask(f"[cyan]{key}[/cyan] [{val}]", default=val)
             else:
                 new_val = Prompt.ask(f"[cyan]{key}[/cyan] [{val}]", default=str(val))
             
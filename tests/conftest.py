@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The project runs from its root (python main.py); make its packages importable the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,89 @@
+import pytest
+
+from core.job_queue import JobQueue
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    yield queue
+    queue.close()
+
+
+def items(*keys):
+    return [(key, f'https://host.example/{key}', f'/downloads/{key}.mp4') for key in keys]
+
+
+def test_enqueue_only_adds_new_keys(jobs):
+    assert jobs.enqueue('series', items('e1', 'e2')) == 2
+    assert jobs.enqueue('series', items('e1', 'e2', 'e3')) == 1
+    assert jobs.enqueue('other', items('e1')) == 1
+    assert [job.key for job in jobs.pending('series')] == ['e1', 'e2', 'e3']
+
+
+def test_entering_resolving_counts_an_attempt(jobs):
+    jobs.enqueue('series', items('e1'))
+    job = jobs.get('series', 'e1')
+    jobs.update(job.id, 'resolving')
+    jobs.update(job.id, 'downloading', target='/downloads/e1 (1).mp4')
+    jobs.update(job.id, 'done', bytes=1234)
+
+    job = jobs.get('series', 'e1')
+    assert (job.state, job.attempts, job.bytes, job.target) == ('done', 1, 1234, '/downloads/e1 (1).mp4')
+
+
+def test_failover_reporter_does_not_count_attempts(jobs):
+    jobs.enqueue('series', items('e1'))
+    job_id = jobs.get('series', 'e1').id
+    report, failover_report = jobs.reporter(job_id), jobs.reporter(job_id, count_attempts=False)
+    report('resolving')
+    report('failed', error='403')
+    failover_report('resolving')
+    failover_report('failed', error='timeout')
+
+    job = jobs.get('series', 'e1')
+    assert (job.state, job.attempts, job.error) == ('failed', 1, 'timeout')
+
+
+def test_unknown_state_is_rejected(jobs):
+    jobs.enqueue('series', items('e1'))
+    with pytest.raises(ValueError):
+        jobs.update(jobs.get('series', 'e1').id, 'paused')
+
+
+def test_requeue_interrupted_and_retryable_jobs(jobs):
+    jobs.enqueue('series', items('active', 'retry', 'exhausted', 'done'))
+    ids = {key: jobs.get('series', key).id for key in ('active', 'retry', 'exhausted', 'done')}
+    jobs.update(ids['active'], 'downloading')
+    jobs.update(ids['retry'], 'resolving')
+    jobs.update(ids['retry'], 'failed')
+    for _ in range(3):
+        jobs.update(ids['exhausted'], 'resolving')
+    jobs.update(ids['exhausted'], 'failed')
+    jobs.update(ids['done'], 'done')
+
+    assert jobs.requeue('series', max_attempts=3) == 2
+    assert [job.key for job in jobs.pending('series')] == ['active', 'retry']
+    assert jobs.counts('series') == {'pending': 2, 'failed': 1, 'done': 1}
+
+
+def test_queue_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(path)
+    queue.enqueue('series', items('e1'))
+    queue.update(queue.get('series', 'e1').id, 'downloading')
+    queue.close()
+
+    queue = JobQueue(path)
+    assert queue.requeue('series') == 1
+    assert queue.get('series', 'e1').state == 'pending'
+    queue.close()
+
+
+def test_throughput_over_recent_runs(jobs):
+    assert jobs.throughput() == 0.0
+    jobs.record_throughput(100, 100.0)
+    jobs.record_throughput(3000, 1.0)
+    jobs.record_throughput(1000, 1.0)
+    assert jobs.throughput(runs=2) == 2000.0
+    assert jobs.throughput() == pytest.approx(4100 / 102)
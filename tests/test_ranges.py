@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+from network.ranges import RangeScheduler, RangesNotSupported
+
+MB = 1024 * 1024
+
+
+def drain(scheduler, claim):
+    """Pretend a worker received the whole claim"""
+    scheduler.advance(claim, scheduler.clip(claim, claim.remaining))
+    scheduler.complete(claim)
+
+
+def test_pieces_follow_the_absolute_grid():
+    scheduler = RangeScheduler([(0, 10 * MB - 1)], piece_size=4 * MB)
+    claims = [scheduler.next_range() for _ in range(3)]
+    assert [(c.start, c.end) for c in claims] == [(0, 4 * MB - 1), (4 * MB, 8 * MB - 1), (8 * MB, 10 * MB - 1)]
+
+
+def test_resumed_gaps_are_cut_on_the_same_grid():
+    scheduler = RangeScheduler([(3 * MB, 9 * MB - 1)], piece_size=4 * MB)
+    claims = [scheduler.next_range() for _ in range(3)]
+    assert [(c.start, c.end) for c in claims] == [(3 * MB, 4 * MB - 1), (4 * MB, 8 * MB - 1), (8 * MB, 9 * MB - 1)]
+
+
+def test_idle_worker_steals_the_upper_half_aligned():
+    scheduler = RangeScheduler([(0, 8 * MB - 1)], piece_size=8 * MB, min_split=MB, align=MB)
+    slow = scheduler.next_range()
+    scheduler.advance(slow, MB + 123)
+
+    stolen = scheduler.next_range()
+    assert stolen.start % MB == 0
+    assert slow.end == stolen.start - 1
+    assert stolen.end == 8 * MB - 1
+    assert slow.pos < stolen.start
+
+
+def test_small_tail_is_not_split():
+    scheduler = RangeScheduler([(0, 3 * MB - 1)], piece_size=8 * MB, min_split=2 * MB)
+    scheduler.next_range()
+    claim, finished, _ = scheduler.poll()
+    assert claim is None and not finished
+
+
+def test_clip_stops_a_victim_at_its_new_end():
+    scheduler = RangeScheduler([(0, 8 * MB - 1)], piece_size=8 * MB, min_split=MB)
+    victim = scheduler.next_range()
+    scheduler.next_range()  # steals the upper half
+    assert scheduler.clip(victim, 8 * MB) == victim.remaining
+
+
+def test_every_byte_is_covered_exactly_once_by_concurrent_workers():
+    size = 37 * MB + 5
+    scheduler = RangeScheduler([(0, size - 1)], piece_size=4 * MB, min_split=256 * 1024, align=64 * 1024)
+    received = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            claim = scheduler.next_range()
+            if claim is None:
+                return
+            while not claim.done:
+                take = scheduler.clip(claim, 300 * 1024)
+                if not take:
+                    break
+                with lock:
+                    received.append((claim.pos, claim.pos + take - 1))
+                scheduler.advance(claim, take)
+            scheduler.complete(claim)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    pos = 0
+    for start, end in sorted(received):
+        assert start == pos, "gap or overlap"
+        pos = end + 1
+    assert pos == size
+    assert not scheduler.failed
+
+
+def test_failed_range_is_retried_from_where_it_stopped():
+    scheduler = RangeScheduler([(0, MB - 1)], backoff=0)
+    claim = scheduler.next_range()
+    scheduler.advance(claim, 1000)
+    scheduler.fail(claim, IOError("reset"))
+
+    retry = scheduler.next_range()
+    assert (retry.start, retry.end) == (1000, MB - 1)
+    assert retry.attempts == 1
+    drain(scheduler, retry)
+    assert scheduler.next_range() is None
+    assert not scheduler.failed
+
+
+def test_gives_up_after_max_attempts_without_progress():
+    scheduler = RangeScheduler([(0, MB - 1)], max_attempts=3, backoff=0)
+    for _ in range(3):
+        claim = scheduler.next_range()
+        scheduler.fail(claim, IOError("refused"))
+    assert scheduler.failed
+    assert scheduler.next_range() is None
+
+
+def test_abort_fails_the_file_at_once():
+    scheduler = RangeScheduler([(0, 16 * MB - 1)], piece_size=4 * MB)
+    claim = scheduler.next_range()
+    error = RangesNotSupported("Server ignored the Range header")
+    scheduler.abort(claim, error)
+    assert scheduler.failed
+    assert scheduler.last_error is error
+    assert scheduler.poll() == (None, True, None)
+
+
+def test_backoff_is_reported_to_async_pollers():
+    scheduler = RangeScheduler([(0, MB - 1)], backoff=10)
+    scheduler.fail(scheduler.next_range(), IOError("reset"))
+    claim, finished, wait_for = scheduler.poll()
+    assert claim is None and not finished
+    assert wait_for == pytest.approx(10, rel=0.25)
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from network.ratelimit import BandwidthLimiter, TokenBucket
+
+
+def at(hour, minute=0):
+    return time.struct_time((2024, 1, 1, hour, minute, 0, 0, 1, -1))
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    assert bucket.reserve(10 ** 9) == 0.0
+
+
+def test_bucket_debt_accumulates():
+    bucket = TokenBucket(1000)
+    first = bucket.reserve(1000)
+    second = bucket.reserve(1000)
+    # Starting empty, each reservation adds a second of debt
+    assert first == pytest.approx(1.0, abs=0.05)
+    assert second == pytest.approx(2.0, abs=0.05)
+
+
+def test_bucket_refills_up_to_the_burst(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    bucket = TokenBucket(1000, burst=2000)
+    now[0] += 60  # idle for a minute only banks the burst
+    assert bucket.reserve(2000) == 0.0
+    assert bucket.reserve(500) == pytest.approx(0.5)
+
+
+def make_limiter(**settings):
+    limiter = BandwidthLimiter()
+    limiter.configure(settings)
+    return limiter
+
+
+def test_schedule_windows_and_default():
+    limiter = make_limiter(bandwidth_limit=100, bandwidth_schedule=[
+        {'from': '09:00', 'to': '17:00', 'limit': 50},
+    ])
+    assert limiter.scheduled_limit(at(8, 59)) == 100 * 1024
+    assert limiter.scheduled_limit(at(9, 0)) == 50 * 1024
+    assert limiter.scheduled_limit(at(17, 0)) == 100 * 1024
+
+
+def test_schedule_window_wrapping_midnight():
+    limiter = make_limiter(bandwidth_schedule=[{'from': '22:00', 'to': '07:00', 'limit': 0}],
+                           bandwidth_limit=200)
+    assert limiter.scheduled_limit(at(23, 30)) == 0
+    assert limiter.scheduled_limit(at(3)) == 0
+    assert limiter.scheduled_limit(at(7)) == 200 * 1024
+    assert limiter.scheduled_limit(at(21, 59)) == 200 * 1024
+
+
+def test_malformed_schedule_windows_are_skipped():
+    limiter = make_limiter(bandwidth_limit=10, bandwidth_schedule=[
+        {'from': 'noon', 'to': '13:00', 'limit': 1},
+        {'to': '13:00', 'limit': 1},
+    ])
+    assert limiter.scheduled_limit(at(12, 30)) == 10 * 1024
+
+
+def test_per_host_limits_only_apply_to_their_host():
+    limiter = make_limiter(bandwidth_host_limits={'CDN.example': 1})
+    assert limiter.reserve('https://other.example/v.mp4', 10 ** 6) == 0.0
+    assert limiter.reserve('https://cdn.example/v.mp4', 1024) == pytest.approx(1.0, abs=0.05)
+
+
+def test_global_and_host_limits_take_the_longer_delay():
+    limiter = make_limiter(bandwidth_limit=4, bandwidth_host_limits={'cdn.example': 1})
+    # 4 KB against 4 KB/s globally but 1 KB/s for this host
+    assert limiter.reserve('https://cdn.example/v.mp4', 4096) == pytest.approx(4.0, abs=0.05)
@@ -0,0 +1,85 @@
+import time
+
+from network.resolve_cache import HopCache, ResolutionCache, signed_url_expiry
+
+
+def test_expiry_from_an_epoch_query_parameter():
+    expires = int(time.time()) + 600
+    assert signed_url_expiry(f'https://cdn.example/v.mp4?token=x&Expires={expires}') == expires
+
+
+def test_expiry_in_milliseconds_is_converted():
+    expires = int(time.time()) + 600
+    assert signed_url_expiry(f'https://cdn.example/v.mp4?e={expires * 1000}') == expires
+
+
+def test_small_numbers_are_not_taken_for_timestamps():
+    assert signed_url_expiry('https://cdn.example/v.mp4?e=720') is None
+
+
+def test_aws_expiry_is_read_as_utc():
+    url = 'https://bucket.example/v.mp4?X-Amz-Date=20240101T000000Z&X-Amz-Expires=3600'
+    assert signed_url_expiry(url) == 1704067200 + 3600
+
+
+def test_malformed_aws_date_is_ignored():
+    assert signed_url_expiry('https://bucket.example/v.mp4?X-Amz-Date=yesterday&X-Amz-Expires=3600') is None
+
+
+def test_unsigned_url_has_no_expiry():
+    assert signed_url_expiry('https://cdn.example/v.mp4') is None
+
+
+def make_cache(tmp_path, ttl=3600):
+    return ResolutionCache(str(tmp_path / 'resolve_cache.json'), ttl=ttl)
+
+
+def test_put_get_and_persist(tmp_path):
+    source = {'url': 'https://cdn.example/v.mp4', 'referer': 'https://host.example/e/1'}
+    make_cache(tmp_path).put('https://host.example/e/1', source)
+    assert make_cache(tmp_path).get('https://host.example/e/1') == source
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl=100)
+    cache.put('https://host.example/e/1', {'url': 'https://cdn.example/v.mp4'})
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 101)
+    assert cache.get('https://host.example/e/1') is None
+
+
+def test_signed_expiry_shortens_the_ttl(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl=3600)
+    now = time.time()
+    cache.put('https://host.example/e/1', {'url': f'https://cdn.example/v.mp4?expires={int(now) + 600}'})
+    monkeypatch.setattr(time, 'time', lambda: now + 600 - 30)  # inside the safety margin
+    assert cache.get('https://host.example/e/1') is None
+
+
+def test_links_about_to_expire_are_not_stored(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('https://host.example/e/1', {'url': f'https://cdn.example/v.mp4?expires={int(time.time()) + 10}'})
+    assert cache.get('https://host.example/e/1') is None
+
+
+def test_zero_ttl_disables_the_cache(tmp_path):
+    cache = make_cache(tmp_path, ttl=0)
+    cache.put('https://host.example/e/1', {'url': 'https://cdn.example/v.mp4'})
+    cache.ttl = 3600
+    assert cache.get('https://host.example/e/1') is None
+
+
+def test_invalidate(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('https://host.example/e/1', {'url': 'https://cdn.example/v.mp4'})
+    cache.invalidate('https://host.example/e/1')
+    assert make_cache(tmp_path).get('https://host.example/e/1') is None
+
+
+def test_hop_cache_expires(monkeypatch):
+    hops = HopCache(ttl=10)
+    hops.put('https://short.example/a', 'https://host.example/e/1')
+    assert hops.get('https://short.example/a') == 'https://host.example/e/1'
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert hops.get('https://short.example/a') is None
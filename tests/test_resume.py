@@ -0,0 +1,90 @@
+import os
+
+from network.resume import DownloadState
+
+URL = 'https://cdn.example/v/episode.mp4?token=abc'
+
+
+def make_state(tmp_path, size=100, **kwargs):
+    part = str(tmp_path / 'episode.mp4.part')
+    with open(part, 'wb') as f:
+        f.truncate(size)
+    return DownloadState(part, URL, size, **kwargs)
+
+
+def test_mark_done_merges_adjacent_and_overlapping_ranges(tmp_path):
+    state = make_state(tmp_path)
+    state.mark_done(10, 19)
+    state.mark_done(0, 9)
+    state.mark_done(15, 29)
+    state.mark_done(50, 59)
+    assert state.completed == [(0, 29), (50, 59)]
+    assert state.completed_bytes() == 40
+
+
+def test_missing_ranges_are_the_gaps(tmp_path):
+    state = make_state(tmp_path)
+    state.mark_done(10, 19)
+    state.mark_done(50, 59)
+    assert state.missing_ranges() == [(0, 9), (20, 49), (60, 99)]
+
+
+def test_contiguous_prefix_only_counts_bytes_from_zero(tmp_path):
+    state = make_state(tmp_path)
+    assert state.contiguous_prefix() == 0
+    state.mark_done(10, 19)
+    assert state.contiguous_prefix() == 0
+    state.mark_done(0, 9)
+    state.mark_done(30, 39)
+    assert state.contiguous_prefix() == 20
+
+
+def test_matches_compares_validators(tmp_path):
+    state = make_state(tmp_path, etag='"v1"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+    assert state.matches(URL, 100, '"v1"', 'Mon, 01 Jan 2024 00:00:00 GMT')
+    assert not state.matches(URL, 101, '"v1"')
+    assert not state.matches(URL, 100, '"v2"')
+    assert not state.matches(URL, 100, '', 'Tue, 02 Jan 2024 00:00:00 GMT')
+
+
+def test_matches_without_validators_compares_the_object_path(tmp_path):
+    state = make_state(tmp_path)
+    # Signed query strings change between resolves; the object does not
+    assert state.matches('https://cdn.example/v/episode.mp4?token=xyz', 100)
+    assert not state.matches('https://cdn.example/v/other.mp4?token=abc', 100)
+    assert not state.matches('https://mirror.example/v/episode.mp4?token=abc', 100)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    state = make_state(tmp_path, etag='"v1"')
+    state.mark_done(0, 41)
+    state.save()
+
+    loaded = DownloadState.load(state.part_path)
+    assert loaded.completed == [(0, 41)]
+    assert loaded.etag == '"v1"'
+    assert loaded.matches(URL, 100, '"v1"')
+
+
+def test_load_rejects_a_part_of_the_wrong_size(tmp_path):
+    state = make_state(tmp_path)
+    state.save()
+    with open(state.part_path, 'ab') as f:
+        f.write(b'x')
+    assert DownloadState.load(state.part_path) is None
+
+
+def test_load_rejects_a_corrupt_sidecar(tmp_path):
+    state = make_state(tmp_path)
+    with open(state.path, 'w') as f:
+        f.write('{not json')
+    assert DownloadState.load(state.part_path) is None
+
+
+def test_discard_removes_a_sidecar_that_cannot_be_loaded(tmp_path):
+    state = make_state(tmp_path)
+    with open(state.path, 'w') as f:
+        f.write('{not json')
+    DownloadState.discard(state.part_path)
+    assert not os.path.exists(state.path)
+    DownloadState.discard(state.part_path)  # nothing left to remove
@@ -0,0 +1,124 @@
+import os
+import struct
+
+from network import verify
+from network.verify import PieceHasher
+
+BLOCK = 16
+
+
+def box(kind: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def write(tmp_path, name, data):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def fresh_digest(path):
+    return PieceHasher(os.path.getsize(path), BLOCK).digest(path)[0]
+
+
+def test_streamed_blocks_are_not_read_back(tmp_path):
+    data = os.urandom(BLOCK * 5 + 3)
+    path = write(tmp_path, 'a.bin', data)
+    hasher = PieceHasher(len(data), BLOCK)
+    stream = hasher.stream(0)
+    for i in range(0, len(data), 7):  # chunks that straddle block boundaries
+        stream.update(data[i:i + 7])
+    digest, read_back = hasher.digest(path)
+    assert read_back == 0
+    assert digest == fresh_digest(path)
+
+
+def test_resume_mid_block_reads_back_only_that_block(tmp_path):
+    data = os.urandom(BLOCK * 4)
+    path = write(tmp_path, 'a.bin', data)
+    hasher = PieceHasher(len(data), BLOCK)
+    # Resumed at byte 20: block 1 was only partly seen by this run
+    hasher.stream(20).update(data[20:])
+    digest, read_back = hasher.digest(path)
+    assert read_back == 2  # block 0 from the earlier run, and block 1
+    assert digest == fresh_digest(path)
+
+
+def test_parallel_streams_give_the_same_digest(tmp_path):
+    data = os.urandom(BLOCK * 6)
+    path = write(tmp_path, 'a.bin', data)
+    hasher = PieceHasher(len(data), BLOCK)
+    hasher.stream(BLOCK * 3).update(data[BLOCK * 3:])
+    hasher.stream(0).update(data[:BLOCK * 3])
+    assert hasher.digest(path) == (fresh_digest(path), 0)
+
+
+def test_size_mismatch_drops_the_trailing_digests(tmp_path):
+    data = os.urandom(BLOCK * 3)
+    hasher = PieceHasher(BLOCK * 4, BLOCK)
+    hasher.stream(0).update(data + b'\0' * BLOCK)
+    path = write(tmp_path, 'a.bin', data[:BLOCK * 2 + 5])
+    digest, read_back = hasher.digest(path)
+    assert read_back == 1
+    assert digest == fresh_digest(path)
+
+
+def test_verify_accepts_a_complete_mp4(tmp_path):
+    path = write(tmp_path, 'ep.mp4', box(b'ftyp', b'isom') + box(b'moov', b'x' * 20) + box(b'mdat', b'y' * 40))
+    result = verify.verify_file(path)
+    assert result.ok and result.container == 'mp4'
+
+
+def test_verify_rejects_a_truncated_mp4(tmp_path):
+    data = box(b'ftyp', b'isom') + box(b'moov') + box(b'mdat', b'y' * 40)
+    path = write(tmp_path, 'ep.mp4', data[:-10])
+    result = verify.verify_file(path)
+    assert not result.ok and 'truncated' in result.reason
+
+
+def test_verify_rejects_an_mp4_without_moov(tmp_path):
+    path = write(tmp_path, 'ep.mp4', box(b'ftyp', b'isom') + box(b'mdat', b'y' * 40))
+    assert 'moov' in verify.verify_file(path).reason
+
+
+def test_verify_rejects_html(tmp_path):
+    path = write(tmp_path, 'ep.mp4', b'\n  <!DOCTYPE html><html><body>Access denied</body></html>')
+    result = verify.verify_file(path)
+    assert not result.ok and result.container == 'html'
+
+
+def test_verify_rejects_a_size_mismatch(tmp_path):
+    path = write(tmp_path, 'ep.ts', b'\x47' * 376)
+    assert not verify.verify_file(path, expected_size=400).ok
+    assert verify.verify_file(path, expected_size=376).container == 'ts'
+
+
+def test_check_trusts_the_manifest_until_the_file_changes(tmp_path, monkeypatch):
+    path = write(tmp_path, 'ep.ts', b'\x47' * 376)
+    assert verify.check(path).ok
+    assert 'ep.ts' in verify.load_manifest(str(tmp_path))
+
+    calls = []
+    monkeypatch.setattr(verify, 'verify_file', lambda p: calls.append(p) or verify.VerifyResult(False))
+    assert verify.check(path).ok
+    assert calls == []
+
+    write(tmp_path, 'ep.ts', b'<html>gone</html>')
+    assert not verify.check(path).ok
+    assert calls == [path]
+
+
+def test_finalize_discards_a_bad_part(tmp_path):
+    part = write(tmp_path, 'ep.mp4.part', b'<html>expired</html>')
+    target = str(tmp_path / 'ep.mp4')
+    assert not verify.finalize_download(part, target, log=lambda message: None)
+    assert not os.path.exists(part) and not os.path.exists(target)
+
+
+def test_finalize_moves_a_good_part_into_place(tmp_path):
+    part = write(tmp_path, 'ep.ts.part', b'\x47' * 376)
+    target = str(tmp_path / 'ep.ts')
+    assert verify.finalize_download(part, target, expected_size=376)
+    assert os.path.exists(target) and not os.path.exists(part)
+    assert verify.load_manifest(str(tmp_path))['ep.ts']['ok']